@@ -0,0 +1,333 @@
+"""
+Teste de carga e replay de tráfego.
+
+Formato JSONL de tráfego: uma chamada por linha, por exemplo
+
+    {"ts": 1718000000.0, "endpoint": "/api/v1/pdf-processor/", "sistema_processual": "PJE",
+     "arquivo": "pdfs/3f2a....pdf", "nome_arquivo": "processo.pdf", "status": 200, "duracao": 1.42}
+    {"endpoint": "/api/v1/divide-pdf/", "sistema_processual": "E-proc",
+     "sintetico": {"eventos": 20, "paginas_por_evento": 3}, "parametros": {"formato": "indexado"}}
+
+- endpoint e sistema_processual são obrigatórios.
+- arquivo: caminho do PDF, relativo ao arquivo JSONL; sintetico: gera o PDF com
+  processor.samples. Um dos dois deve estar presente.
+- parametros: campos adicionais do formulário (PARAMETROS, como formato e stream),
+  reenviados como foram gravados.
+- ts, status e duracao são preenchidos na gravação e servem apenas de referência.
+
+A gravação de tráfego real é feita pelo TrafficRecorderMiddleware quando
+LOADTEST_RECORD_FILE está definido.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from urllib import error, request
+
+ENDPOINTS = ("/api/v1/pdf-processor/", "/api/v1/divide-pdf/")
+# Campos opcionais dos endpoints que mudam o processamento ou a resposta
+PARAMETROS = ("formato", "stream")
+PERCENTIS = (50, 90, 95, 99)
+_record_lock = threading.Lock()
+
+
+def read_traffic(caminho):
+    registros = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for numero, linha in enumerate(arquivo, start=1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            registro = json.loads(linha)
+            if registro.get("endpoint") not in ENDPOINTS or not registro.get("sistema_processual"):
+                raise ValueError(f"Linha {numero}: endpoint ou sistema_processual inválido.")
+            if not registro.get("arquivo") and not registro.get("sintetico"):
+                raise ValueError(f"Linha {numero}: informe 'arquivo' ou 'sintetico'.")
+            registros.append(registro)
+    return registros
+
+
+def synthetic_traffic(sistemas, eventos=20, paginas_por_evento=3):
+    """
+    Uma chamada sintética de cada endpoint para cada sistema.
+    """
+    return [
+        {
+            "endpoint": endpoint,
+            "sistema_processual": sistema,
+            "sintetico": {"eventos": eventos, "paginas_por_evento": paginas_por_evento},
+        }
+        for sistema in sistemas
+        for endpoint in ENDPOINTS
+    ]
+
+
+def record_call(caminho, endpoint, sistema_processual, nome_arquivo, pdf_file, status, duracao, parametros=None):
+    """
+    Acrescenta uma chamada ao JSONL de tráfego, guardando o PDF (por hash) ao lado dele.
+    """
+    diretorio = os.path.join(os.path.dirname(os.path.abspath(caminho)), "pdfs")
+    os.makedirs(diretorio, exist_ok=True)
+
+    hash_pdf = hashlib.sha256()
+    for chunk in pdf_file.chunks():
+        hash_pdf.update(chunk)
+    relativo = os.path.join("pdfs", f"{hash_pdf.hexdigest()}.pdf")
+    destino = os.path.join(os.path.dirname(os.path.abspath(caminho)), relativo)
+
+    if not os.path.exists(destino):
+        with open(destino, "wb") as arquivo:
+            for chunk in pdf_file.chunks():
+                arquivo.write(chunk)
+
+    registro = {
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "sistema_processual": sistema_processual,
+        "arquivo": relativo,
+        "nome_arquivo": nome_arquivo,
+        "status": status,
+        "duracao": round(duracao, 4),
+    }
+    if parametros:
+        registro["parametros"] = parametros
+    with _record_lock, open(caminho, "a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+def load_payload(registro, base_dir, cache):
+    """
+    Bytes do PDF da chamada, lidos do disco ou gerados uma única vez.
+    """
+    chave = registro.get("arquivo") or json.dumps([registro["sistema_processual"], registro["sintetico"]])
+    if chave not in cache:
+        if registro.get("arquivo"):
+            with open(os.path.join(base_dir, registro["arquivo"]), "rb") as arquivo:
+                cache[chave] = arquivo.read()
+        else:
+            from processor.samples import sample_pdf
+
+            cache[chave] = sample_pdf(registro["sistema_processual"], **registro["sintetico"])
+    return cache[chave]
+
+
+def multipart_body(campos, nome_arquivo, conteudo):
+    boundary = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    partes.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{nome_arquivo}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n".encode()
+    )
+    partes.append(conteudo)
+    partes.append(f"\r\n--{boundary}--\r\n".encode())
+    return b"".join(partes), f"multipart/form-data; boundary={boundary}"
+
+
+def send(base_url, token, registro, conteudo, timeout):
+    """
+    Envia uma chamada e retorna (status, segundos, bytes da resposta). Status 0 indica falha de conexão.
+    """
+    nome_arquivo = registro.get("nome_arquivo") or "loadtest.pdf"
+    corpo, content_type = multipart_body(
+        {
+            "sistema_processual": registro["sistema_processual"],
+            "nome_arquivo": nome_arquivo,
+            **registro.get("parametros", {}),
+        },
+        nome_arquivo,
+        conteudo,
+    )
+    chamada = request.Request(
+        base_url.rstrip("/") + registro["endpoint"],
+        data=corpo,
+        method="POST",
+        headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
+    )
+
+    inicio = time.perf_counter()
+    try:
+        with request.urlopen(chamada, timeout=timeout) as resposta:
+            tamanho = len(resposta.read())
+            status = resposta.status
+    except error.HTTPError as e:
+        tamanho = len(e.read())
+        status = e.code
+    except (error.URLError, OSError):
+        tamanho = 0
+        status = 0
+    return status, time.perf_counter() - inicio, tamanho
+
+
+def process_rss(pid):
+    """
+    RSS, em bytes, do processo e de seus descendentes (workers). Requer /proc (Linux).
+    """
+    total = 0
+    pendentes = [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        try:
+            with open(f"/proc/{atual}/status") as arquivo:
+                for linha in arquivo:
+                    if linha.startswith("VmRSS:"):
+                        total += int(linha.split()[1]) * 1024
+                        break
+            for tarefa in os.listdir(f"/proc/{atual}/task"):
+                with open(f"/proc/{atual}/task/{tarefa}/children") as arquivo:
+                    pendentes.extend(int(filho) for filho in arquivo.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+def percentile(valores, percentil):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, -(-len(ordenados) * percentil // 100) - 1)
+    return ordenados[int(indice)]
+
+
+class LoadTest:
+    """
+    Reproduz as chamadas com `concorrencia` threads e, se `taxa` > 0, limitado a
+    `taxa` chamadas por segundo. Amostra o RSS do servidor ao longo da execução.
+    """
+    def __init__(self, base_url, token, registros, base_dir, concorrencia=4, taxa=0,
+                 total=None, timeout=300, server_pid=None, intervalo_rss=0.5):
+        self.base_url = base_url
+        self.token = token
+        self.registros = registros
+        self.base_dir = base_dir
+        self.concorrencia = concorrencia
+        self.taxa = taxa
+        self.total = total or len(registros)
+        self.timeout = timeout
+        self.server_pid = server_pid
+        self.intervalo_rss = intervalo_rss
+
+        self.resultados = []
+        self.rss = []
+        self._proximo = 0
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def _next_index(self):
+        with self._lock:
+            if self._proximo >= self.total:
+                return None
+            indice = self._proximo
+            self._proximo += 1
+            return indice
+
+    def _worker(self, inicio):
+        while True:
+            indice = self._next_index()
+            if indice is None:
+                return
+
+            if self.taxa:
+                espera = inicio + indice / self.taxa - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+
+            registro = self.registros[indice % len(self.registros)]
+            with self._lock:
+                conteudo = load_payload(registro, self.base_dir, self._payloads)
+            status, duracao, tamanho = send(self.base_url, self.token, registro, conteudo, self.timeout)
+            with self._lock:
+                self.resultados.append({
+                    "endpoint": registro["endpoint"],
+                    "sistema_processual": registro["sistema_processual"],
+                    "status": status,
+                    "duracao": duracao,
+                    "bytes": tamanho,
+                })
+
+    def _sample_rss(self, inicio, finalizado):
+        while not finalizado.wait(self.intervalo_rss):
+            self.rss.append((round(time.perf_counter() - inicio, 2), process_rss(self.server_pid)))
+
+    def run(self):
+        inicio = time.perf_counter()
+        finalizado = threading.Event()
+
+        amostrador = None
+        if self.server_pid and os.path.isdir("/proc"):
+            amostrador = threading.Thread(target=self._sample_rss, args=(inicio, finalizado), daemon=True)
+            amostrador.start()
+
+        workers = [threading.Thread(target=self._worker, args=(inicio,)) for _ in range(self.concorrencia)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        finalizado.set()
+        if amostrador:
+            amostrador.join()
+
+        return self.report(time.perf_counter() - inicio)
+
+    def report(self, duracao):
+        return {
+            "duracao": duracao,
+            "concorrencia": self.concorrencia,
+            "taxa": self.taxa,
+            "geral": summarize(self.resultados, duracao),
+            "endpoints": {
+                endpoint: summarize([r for r in self.resultados if r["endpoint"] == endpoint], duracao)
+                for endpoint in ENDPOINTS
+            },
+            "rss": {
+                "amostras": self.rss,
+                "max": max((valor for _, valor in self.rss), default=None),
+                "final": self.rss[-1][1] if self.rss else None,
+            },
+        }
+
+
+def summarize(resultados, duracao):
+    latencias = [r["duracao"] for r in resultados if 200 <= r["status"] < 300]
+    erros = sum(1 for r in resultados if not 200 <= r["status"] < 300)
+    return {
+        "chamadas": len(resultados),
+        "erros": erros,
+        "taxa_erro": erros / len(resultados) if resultados else 0.0,
+        "vazao": len(latencias) / duracao if duracao else 0.0,
+        "latencia": {f"p{p}": percentile(latencias, p) for p in PERCENTIS},
+    }
+
+
+def compare(atual, baseline, tolerancia=0.1):
+    """
+    Compara duas execuções. Retorna linhas (métrica, baseline, atual, variação, regressão).
+    Latência e taxa de erro pioram quando sobem; vazão e RSS, conforme indicado.
+    """
+    metricas = [(f"latencia.p{p}", ("geral", "latencia", f"p{p}"), True) for p in PERCENTIS]
+    metricas += [
+        ("vazao", ("geral", "vazao"), False),
+        ("taxa_erro", ("geral", "taxa_erro"), True),
+        ("rss.max", ("rss", "max"), True),
+    ]
+
+    def valor(relatorio, caminho):
+        for chave in caminho:
+            relatorio = (relatorio or {}).get(chave)
+        return relatorio
+
+    linhas = []
+    for nome, caminho, maior_pior in metricas:
+        anterior, novo = valor(baseline, caminho), valor(atual, caminho)
+        if anterior is None or novo is None:
+            continue
+        variacao = (novo - anterior) / anterior if anterior else (0.0 if novo == anterior else float("inf"))
+        regressao = variacao > tolerancia if maior_pior else variacao < -tolerancia
+        linhas.append((nome, anterior, novo, variacao, regressao))
+    return linhas
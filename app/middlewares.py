@@ -2,31 +2,151 @@ import glob
 import logging
 import os
 import shutil
+import tempfile
+import time
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files import File
+
+from app import loadtest
+from uploads.store import UploadError, get_upload_store
 
 logging.basicConfig(level=logging.INFO)
 
 class CleanTempMiddleware:
     """
-    Middleware para limpar arquivos temporários na pasta TEMP_DIR após cada requisição.
+    Middleware que cria um diretório de trabalho exclusivo para cada requisição
+    (request.workspace, dentro do TEMP_DIR) e o remove ao final. Requisições
+    concorrentes no mesmo processo não apagam os arquivos umas das outras.
     """
     def __init__(self, get_response):
         self.get_response = get_response
         self.temp_dir = settings.TEMP_DIR  # Agora usando o TEMP_DIR do settings
         os.makedirs(self.temp_dir, exist_ok=True)
+        self.clean_stale_files()
 
     def __call__(self, request):
+        workspace = tempfile.mkdtemp(dir=self.temp_dir)
+        request.workspace = workspace
+
         response = self.get_response(request)
-        self.clean_temp_folder()
+
+        if response.streaming:
+            # A resposta ainda lê do workspace enquanto é enviada: limpa quando ela for fechada
+            self.clean_on_close(response, workspace)
+        else:
+            self.clean_workspace(workspace)
         return response
 
-    def clean_temp_folder(self):
+    def clean_on_close(self, response, workspace):
+        fechar = response.close
+        limpo = False
+
+        def close():
+            # O servidor pode fechar a resposta mais de uma vez: limpa só na primeira
+            nonlocal limpo
+            try:
+                fechar()
+            finally:
+                if not limpo:
+                    limpo = True
+                    self.clean_workspace(workspace)
+
+        response.close = close
+
+    def clean_workspace(self, workspace):
         try:
-            for arquivo in glob.glob(f"{self.temp_dir}/*"):
-                if os.path.isfile(arquivo):
-                    os.remove(arquivo)
-                elif os.path.isdir(arquivo):
-                    shutil.rmtree(arquivo)
-            logging.info(f"Arquivos temporários limpos em {self.temp_dir}")
+            shutil.rmtree(workspace)
+            logging.info(f"Arquivos temporários limpos em {workspace}")
         except Exception as e:
             logging.error(f"Erro ao limpar arquivos temporários: {e}")
+
+    def clean_stale_files(self):
+        # Restos de processos encerrados no meio de uma requisição
+        limite = time.time() - settings.TEMP_MAX_AGE
+        for arquivo in glob.glob(f"{self.temp_dir}/*"):
+            try:
+                if os.path.getmtime(arquivo) >= limite:
+                    continue
+                if os.path.isdir(arquivo):
+                    shutil.rmtree(arquivo)
+                else:
+                    os.remove(arquivo)
+            except Exception as e:
+                logging.error(f"Erro ao limpar arquivos temporários: {e}")
+
+def get_workspace(request):
+    """
+    Diretório de trabalho da requisição; sem o CleanTempMiddleware, o próprio TEMP_DIR.
+    """
+    return getattr(request, "workspace", settings.TEMP_DIR)
+
+class TrafficRecorderMiddleware:
+    """
+    Grava as chamadas aos endpoints de PDF no JSONL de tráfego (LOADTEST_RECORD_FILE)
+    para replay com o comando loadtest. Desativado quando o arquivo não está definido.
+
+    Chamadas com `upload_id` são gravadas com o PDF do upload confirmado; no replay, ele
+    é reenviado no campo `file`, sem o protocolo de upload em partes.
+    """
+    def __init__(self, get_response):
+        if not settings.LOADTEST_RECORD_FILE:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.record_file = settings.LOADTEST_RECORD_FILE
+
+    def __call__(self, request):
+        if request.method != "POST" or request.path not in loadtest.ENDPOINTS:
+            return self.get_response(request)
+
+        # Lido antes da view: o DRF reaproveita request.POST/FILES já processados
+        pdf_file = request.FILES.get("file")
+        upload_id = request.POST.get("upload_id")
+        sistema_processual = request.POST.get("sistema_processual")
+        nome_arquivo = request.POST.get("nome_arquivo")
+        parametros = {
+            nome: request.POST.get(nome) or request.GET.get(nome)
+            for nome in loadtest.PARAMETROS
+            if request.POST.get(nome) or request.GET.get(nome)
+        }
+        if "stream" not in parametros and "application/x-ndjson" in request.headers.get("Accept", ""):
+            parametros["stream"] = "1"
+
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+
+        if not sistema_processual or not (pdf_file or upload_id):
+            return response
+
+        try:
+            if pdf_file:
+                loadtest.record_call(
+                    self.record_file, request.path, sistema_processual, nome_arquivo,
+                    pdf_file, response.status_code, duracao, parametros,
+                )
+            else:
+                self.record_upload(request, upload_id, sistema_processual, nome_arquivo, response, duracao, parametros)
+        except Exception as e:
+            logging.error(f"Erro ao gravar tráfego: {e}")
+        return response
+
+    def record_upload(self, request, upload_id, sistema_processual, nome_arquivo, response, duracao, parametros):
+        """
+        Grava a chamada com o PDF do upload confirmado. O usuário é o autenticado pela
+        view (o DRF o repassa à requisição); uploads inexistentes ou não concluídos não
+        têm PDF a reenviar e são ignorados.
+        """
+        store = get_upload_store()
+        try:
+            meta = store.get(upload_id, request.user.pk)
+        except UploadError:
+            return
+        if not meta["concluido"]:
+            return
+
+        with open(store.data_path(meta), "rb") as arquivo:
+            loadtest.record_call(
+                self.record_file, request.path, sistema_processual, nome_arquivo or meta["nome_arquivo"],
+                File(arquivo), response.status_code, duracao, parametros,
+            )
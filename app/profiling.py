@@ -0,0 +1,249 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.html import format_html, format_html_join
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "profile"
+VALORES_ATIVOS = ("1", "true", "on", "yes")
+EXTENSOES = (".prof", ".folded", ".txt")
+
+# cProfile só admite um perfilador ativo por vez no processo.
+_profile_lock = threading.Lock()
+
+
+def should_profile(request):
+    """
+    Decide se a requisição deve ser perfilada: recurso habilitado, flag enviada
+    por um usuário staff e sorteio dentro da taxa de amostragem.
+    """
+    if not settings.PROFILING_ENABLED:
+        return False
+
+    flag = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if not flag or flag.lower() not in VALORES_ATIVOS:
+        return False
+
+    user = getattr(request, "user", None)
+    if not (user and user.is_staff):
+        return False
+
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class StackSampler(threading.Thread):
+    """
+    Amostra periodicamente a pilha de uma thread e acumula as pilhas no formato
+    "folded" (frame;frame;frame contagem), pronto para flamegraph.pl/speedscope.
+    """
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._finalizado = threading.Event()
+
+    def run(self):
+        while not self._finalizado.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            pilha = []
+            while frame is not None:
+                code = frame.f_code
+                pilha.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            self.stacks[";".join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._finalizado.set()
+        self.join()
+
+    def folded(self):
+        return "".join(f"{pilha} {contagem}\n" for pilha, contagem in self.stacks.most_common())
+
+
+class ProfileStore:
+    """
+    Armazena os perfis em disco, mantendo apenas as `max_entries` capturas mais recentes.
+    """
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def save(self, label, profiler, sampler, duracao):
+        os.makedirs(self.directory, exist_ok=True)
+        nome = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}_{label}"
+        base = os.path.join(self.directory, nome)
+
+        profiler.dump_stats(f"{base}.prof")
+
+        with open(f"{base}.folded", "w", encoding="utf-8") as arquivo:
+            arquivo.write(sampler.folded())
+
+        resumo = io.StringIO()
+        resumo.write(f"{label}: {duracao:.3f}s\n\n")
+        pstats.Stats(profiler, stream=resumo).sort_stats("cumulative").print_stats(40)
+        with open(f"{base}.txt", "w", encoding="utf-8") as arquivo:
+            arquivo.write(resumo.getvalue())
+
+        self.rotate()
+        return nome
+
+    def rotate(self):
+        capturas = self.list()
+        for captura in capturas[self.max_entries:]:
+            for extensao in EXTENSOES:
+                try:
+                    os.remove(os.path.join(self.directory, captura["nome"] + extensao))
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        """
+        Lista as capturas da mais recente para a mais antiga.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        capturas = []
+        for arquivo in sorted(os.listdir(self.directory), reverse=True):
+            nome, extensao = os.path.splitext(arquivo)
+            if extensao != ".prof":
+                continue
+            caminho = os.path.join(self.directory, arquivo)
+            capturas.append({
+                "nome": nome,
+                "tamanho": os.path.getsize(caminho),
+                "criado_em": datetime.fromtimestamp(os.path.getmtime(caminho), timezone.utc),
+            })
+        return capturas
+
+    def path(self, arquivo):
+        nome, extensao = os.path.splitext(arquivo)
+        if extensao not in EXTENSOES or nome not in {captura["nome"] for captura in self.list()}:
+            raise FileNotFoundError(arquivo)
+        return os.path.join(self.directory, arquivo)
+
+
+def get_store():
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_ENTRIES)
+
+
+class RequestProfile:
+    """
+    Captura de uma requisição em um ou mais trechos (`section`), como cada evento de
+    uma resposta em streaming: os trechos se acumulam em um único perfil, salvo por
+    `finish`. Fora dos trechos o amostrador fica parado. Inativa quando a requisição
+    não deve ser perfilada.
+    """
+    def __init__(self, request, label):
+        self.label = label
+        self.ativo = should_profile(request) and _profile_lock.acquire(blocking=False)
+        self.duracao = 0.0
+        if self.ativo:
+            self.profiler = cProfile.Profile()
+            self.sampler = StackSampler(None, settings.PROFILING_SAMPLE_INTERVAL)
+            self.sampler.start()
+
+    @contextmanager
+    def section(self):
+        if not self.ativo:
+            yield
+            return
+
+        # Cada trecho pode rodar em uma thread diferente (iteração da resposta)
+        self.sampler.thread_id = threading.get_ident()
+        inicio = time.perf_counter()
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            self.sampler.thread_id = None
+            self.duracao += time.perf_counter() - inicio
+
+    def finish(self):
+        if not self.ativo:
+            return
+        self.ativo = False
+        self.sampler.parar()
+        try:
+            nome = get_store().save(self.label, self.profiler, self.sampler, self.duracao)
+            logger.info(f"Perfil salvo: {nome}")
+        except Exception as e:
+            logger.error(f"Erro ao salvar perfil: {e}")
+        finally:
+            _profile_lock.release()
+
+
+@contextmanager
+def profile_request(request, label):
+    """
+    Perfila o bloco com cProfile e amostragem de pilhas quando a requisição pede.
+    Requisições normais pagam apenas a checagem de `should_profile`.
+    """
+    perfil = RequestProfile(request, label)
+    try:
+        with perfil.section():
+            yield
+    finally:
+        perfil.finish()
+
+
+def profile_list(request):
+    """
+    Página administrativa com as capturas de perfil disponíveis.
+    """
+    linhas = format_html_join(
+        "\n",
+        "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+        (
+            (
+                captura["nome"],
+                captura["criado_em"].strftime("%Y-%m-%d %H:%M:%S"),
+                captura["tamanho"],
+                format_html_join(
+                    " ", '<a href="{}">{}</a>',
+                    ((f"{captura['nome']}{extensao}/", extensao) for extensao in EXTENSOES),
+                ),
+            )
+            for captura in get_store().list()
+        ),
+    )
+    html = format_html(
+        "<html><head><title>Perfis</title></head><body><h1>Perfis capturados</h1>"
+        "<table><tr><th>Captura</th><th>Criado em (UTC)</th><th>Bytes (.prof)</th><th>Arquivos</th></tr>"
+        "{}</table></body></html>",
+        linhas,
+    )
+    return HttpResponse(html)
+
+
+def profile_download(request, arquivo):
+    try:
+        caminho = get_store().path(arquivo)
+    except FileNotFoundError:
+        raise Http404("Perfil não encontrado.")
+    return FileResponse(open(caminho, "rb"), as_attachment=True, filename=arquivo)
+
+
+profile_list_view = admin.site.admin_view(profile_list)
+profile_download_view = admin.site.admin_view(profile_download)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     "authentication",
     "processor",
     "divider",
+    "uploads",
 ]
 
 MIDDLEWARE = [
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 
+    "app.middlewares.TrafficRecorderMiddleware",
     "app.middlewares.CleanTempMiddleware",
 ]
 
@@ -128,7 +130,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -137,9 +139,86 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=365),
 }
 
+# Cache do Django. Com vários processos, use um backend compartilhado (por exemplo
+# django.core.cache.backends.redis.RedisCache e CACHE_LOCATION=redis://...) para que a
+# invalidação do usuário autenticado alcance todos; o padrão, em memória, é por processo.
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
+# Cache de tokens validados (por processo): evita repetir a verificação da assinatura e dos
+# claims; 0 desativa.
+JWT_AUTH_CACHE_TTL = config("JWT_AUTH_CACHE_TTL", default=300, cast=int)
+JWT_AUTH_CACHE_SIZE = config("JWT_AUTH_CACHE_SIZE", default=10000, cast=int)
+# Usuários autenticados no cache do Django: evita a consulta ao banco a cada requisição.
+# Salvar ou excluir o usuário o remove do cache; alterações via QuerySet.update() valem
+# quando a entrada expira, por isso o prazo é curto. 0 desativa.
+JWT_AUTH_USER_CACHE_TTL = config("JWT_AUTH_USER_CACHE_TTL", default=30, cast=int)
+
 
 # Diretório temporário personalizado
 TEMP_DIR = os.path.join(BASE_DIR, 'tmp')
 
 # Cria o diretório se ele não existir
-os.makedirs(TEMP_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+# Cada requisição trabalha em um subdiretório próprio do TEMP_DIR; restos mais antigos
+# que isto (segundos) são removidos quando o processo sobe
+TEMP_MAX_AGE = config("TEMP_MAX_AGE", default=3600, cast=int)
+
+# Perfilamento sob demanda: apenas usuários staff, com o header "X-Profile: 1"
+# ou o parâmetro "?profile=1", amostrado por PROFILING_SAMPLE_RATE
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=1.0, cast=float)
+PROFILING_SAMPLE_INTERVAL = config("PROFILING_SAMPLE_INTERVAL", default=0.005, cast=float)
+PROFILING_MAX_ENTRIES = config("PROFILING_MAX_ENTRIES", default=50, cast=int)
+
+# Fora do TEMP_DIR, cujos diretórios de requisição são removidos ao final de cada uma
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Processadores de sistemas processuais adicionais, carregados no primeiro uso:
+# {"Sistema": "modulo.Objeto"}, onde Objeto é um SystemSpec ou uma subclasse de ProcessorBase
+PROCESSOR_PLUGINS = {}
+
+# Aquece o worker (imports, padrões e um PDF mínimo por processador/divisor) ao carregar o wsgi/asgi.
+# Com `gunicorn --preload` o aquecimento roda no mestre e é herdado pelos workers.
+WARMUP_ON_STARTUP = config("WARMUP_ON_STARTUP", default=False, cast=bool)
+
+# Grava as chamadas a /pdf-processor/ e /divide-pdf/ neste JSONL para replay (vazio desativa)
+LOADTEST_RECORD_FILE = config("LOADTEST_RECORD_FILE", default="")
+
+# Uploads grandes são gravados direto no TEMP_DIR, de onde o PdfSource os vincula sem cópia
+FILE_UPLOAD_TEMP_DIR = TEMP_DIR
+
+# Cache em disco dos PDFs de eventos já divididos (chave: hash do PDF, páginas e perfil de saída)
+ARTIFACT_CACHE_ENABLED = config("ARTIFACT_CACHE_ENABLED", default=True, cast=bool)
+ARTIFACT_CACHE_DIR = config("ARTIFACT_CACHE_DIR", default=os.path.join(BASE_DIR, 'artifacts'))
+ARTIFACT_CACHE_MAX_BYTES = config("ARTIFACT_CACHE_MAX_BYTES", default=2 * 1024 ** 3, cast=int)
+ARTIFACT_CACHE_TTL = config("ARTIFACT_CACHE_TTL", default=7 * 24 * 3600, cast=int)
+
+# Uploads em partes e retomáveis (fora do TEMP_DIR, para sobreviver entre requisições)
+UPLOAD_DIR = config("UPLOAD_DIR", default=os.path.join(BASE_DIR, 'tmp_uploads'))
+UPLOAD_TTL = config("UPLOAD_TTL", default=24 * 3600, cast=int)
+UPLOAD_MAX_CHUNK_BYTES = config("UPLOAD_MAX_CHUNK_BYTES", default=64 * 1024 ** 2, cast=int)
+# Cota: tamanho máximo de cada upload (declarado ou não) e uploads ativos por usuário
+UPLOAD_MAX_BYTES = config("UPLOAD_MAX_BYTES", default=2 * 1024 ** 3, cast=int)
+UPLOAD_MAX_PER_USER = config("UPLOAD_MAX_PER_USER", default=5, cast=int)
+
+# Concorrência: o PyMuPDF não é thread-safe, então as chamadas ao MuPDF são serializadas
+# por processo (processor.source.mupdf_lock) e cada thread usa seu próprio handle do documento.
+# Workers com threads (ex.: gunicorn -k gthread --threads 4) paralelizam upload, gravação e
+# resposta; este limite controla quantas requisições processam PDFs (extração e divisão) ao
+# mesmo tempo. Respostas em streaming só ocupam a vaga enquanto extraem cada evento: com um
+# cliente lento, o PDF fica aberto fora dela (o total de respostas abertas segue as threads).
+PDF_MAX_CONCURRENT_PIPELINES = config("PDF_MAX_CONCURRENT_PIPELINES", default=4, cast=int)
+
+# Limites por requisição (0 desativa). Ao atingir um deles, o processamento para e a
+# resposta traz o resultado parcial (ver processor/guard.py). O limite de memória é o
+# RSS do processo, compartilhado entre as threads de um worker.
+GUARD_MAX_PAGES = config("GUARD_MAX_PAGES", default=20000, cast=int)
+GUARD_MAX_SECONDS = config("GUARD_MAX_SECONDS", default=300, cast=int)
+GUARD_MAX_RSS_BYTES = config("GUARD_MAX_RSS_BYTES", default=0, cast=int)
+GUARD_MAX_OUTPUT_BYTES = config("GUARD_MAX_OUTPUT_BYTES", default=2 * 1024 ** 3, cast=int)
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from rest_framework.test import APIClient
+
+from app import profiling
+from app.loadtest import compare, load_payload, percentile, read_traffic, record_call
+from app.profiling import EXTENSOES, ProfileStore, profile_request, should_profile
+from processor.samples import sample_pdf
+from processor.testing import TempDirTestCase
+
+
+def profile_get(user, **extra):
+    request = RequestFactory().get("/", **extra)
+    request.user = user
+    return request
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+class ShouldProfileTests(SimpleTestCase):
+    def setUp(self):
+        self.staff = get_user_model()(username="staff", is_staff=True)
+        self.usuario = get_user_model()(username="usuario")
+
+    def test_staff_with_flag(self):
+        self.assertTrue(should_profile(profile_get(self.staff, HTTP_X_PROFILE="1")))
+        self.assertTrue(should_profile(profile_get(self.staff, data={"profile": "true"})))
+
+    def test_requires_flag(self):
+        self.assertFalse(should_profile(profile_get(self.staff)))
+        self.assertFalse(should_profile(profile_get(self.staff, HTTP_X_PROFILE="0")))
+
+    def test_requires_staff(self):
+        self.assertFalse(should_profile(profile_get(self.usuario, HTTP_X_PROFILE="1")))
+        self.assertFalse(should_profile(profile_get(AnonymousUser(), HTTP_X_PROFILE="1")))
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_requires_enabled(self):
+        self.assertFalse(should_profile(profile_get(self.staff, HTTP_X_PROFILE="1")))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.25)
+    def test_sample_rate(self):
+        request = profile_get(self.staff, HTTP_X_PROFILE="1")
+        with mock.patch.object(profiling.random, "random", return_value=0.2):
+            self.assertTrue(should_profile(request))
+        with mock.patch.object(profiling.random, "random", return_value=0.3):
+            self.assertFalse(should_profile(request))
+
+
+class ProfileStoreTests(TempDirTestCase):
+    def capture(self, nome):
+        for extensao in EXTENSOES:
+            with open(os.path.join(self.temp_dir, nome + extensao), "w") as arquivo:
+                arquivo.write(nome)
+
+    def test_rotate_keeps_most_recent(self):
+        for indice in range(5):
+            self.capture(f"2024010{indice}T000000000000_divide-pdf")
+
+        ProfileStore(self.temp_dir, max_entries=2).rotate()
+
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), sorted(
+            f"2024010{indice}T000000000000_divide-pdf{extensao}" for indice in (3, 4) for extensao in EXTENSOES
+        ))
+
+    def test_path_accepts_only_captures(self):
+        self.capture("20240101T000000000000_divide-pdf")
+        with open(os.path.join(self.temp_dir, "outro.py"), "w") as arquivo:
+            arquivo.write("")
+        store = ProfileStore(self.temp_dir, max_entries=2)
+
+        for extensao in EXTENSOES:
+            nome = f"20240101T000000000000_divide-pdf{extensao}"
+            self.assertEqual(store.path(nome), os.path.join(self.temp_dir, nome))
+
+        for arquivo in (
+            "20240101T000000000000_divide-pdf.py",
+            "20240101T000000000000_divide-pdf",
+            "outro.py",
+            "inexistente.prof",
+            "../20240101T000000000000_divide-pdf.prof",
+            "/etc/passwd",
+        ):
+            with self.subTest(arquivo=arquivo), self.assertRaises(FileNotFoundError):
+                store.path(arquivo)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_ENTRIES=5)
+class ProfileRequestTests(TempDirTestCase):
+    def test_saves_capture(self):
+        request = profile_get(get_user_model()(username="staff", is_staff=True), HTTP_X_PROFILE="1")
+        with override_settings(PROFILING_DIR=self.temp_dir):
+            with profile_request(request, "teste"):
+                sum(range(1000))
+            capturas = profiling.get_store().list()
+
+        self.assertEqual(len(capturas), 1)
+        self.assertTrue(capturas[0]["nome"].endswith("_teste"))
+        self.assertFalse(profiling._profile_lock.locked())
+
+    def test_skips_unflagged_request(self):
+        request = profile_get(get_user_model()(username="staff", is_staff=True))
+        with override_settings(PROFILING_DIR=self.temp_dir):
+            with profile_request(request, "teste"):
+                pass
+
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+class PercentileTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        valores = list(range(10, 0, -1))
+        self.assertEqual(percentile(valores, 50), 5)
+        self.assertEqual(percentile(valores, 90), 9)
+        self.assertEqual(percentile(valores, 95), 10)
+        self.assertEqual(percentile(valores, 99), 10)
+
+    def test_small_samples(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([0.3], 99), 0.3)
+
+
+def relatorio(p50=1.0, vazao=10.0, taxa_erro=0.0, rss=None):
+    return {
+        "geral": {"latencia": {"p50": p50}, "vazao": vazao, "taxa_erro": taxa_erro},
+        "rss": {"max": rss},
+    }
+
+
+class CompareTests(SimpleTestCase):
+    def regressoes(self, atual, baseline):
+        return {nome: regressao for nome, _, _, _, regressao in compare(atual, baseline, tolerancia=0.1)}
+
+    def test_direction(self):
+        # Latência e taxa de erro pioram ao subir; vazão, ao cair
+        self.assertEqual(
+            self.regressoes(relatorio(p50=1.2, vazao=12.0), relatorio()),
+            {"latencia.p50": True, "vazao": False, "taxa_erro": False},
+        )
+        self.assertEqual(
+            self.regressoes(relatorio(p50=0.8, vazao=8.0), relatorio()),
+            {"latencia.p50": False, "vazao": True, "taxa_erro": False},
+        )
+
+    def test_within_tolerance(self):
+        self.assertFalse(any(self.regressoes(relatorio(p50=1.05, vazao=9.5), relatorio()).values()))
+
+    def test_zero_baseline(self):
+        linhas = {linha[0]: linha for linha in compare(relatorio(taxa_erro=0.1), relatorio())}
+        self.assertEqual(linhas["taxa_erro"][3], float("inf"))
+        self.assertTrue(linhas["taxa_erro"][4])
+
+        linhas = {linha[0]: linha for linha in compare(relatorio(), relatorio())}
+        self.assertEqual(linhas["taxa_erro"][3], 0.0)
+        self.assertFalse(linhas["taxa_erro"][4])
+
+    def test_missing_metrics_are_skipped(self):
+        nomes = [linha[0] for linha in compare(relatorio(rss=100), relatorio())]
+        self.assertNotIn("rss.max", nomes)
+
+
+class TrafficFileTests(TempDirTestCase):
+    def write(self, *linhas):
+        caminho = os.path.join(self.temp_dir, "trafego.jsonl")
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write("\n".join(linhas) + "\n")
+        return caminho
+
+    def test_validation(self):
+        sintetico = {"eventos": 2, "paginas_por_evento": 1}
+        casos = [
+            {"endpoint": "/api/v1/outro/", "sistema_processual": "PJE", "sintetico": sintetico},
+            {"endpoint": "/api/v1/divide-pdf/", "sintetico": sintetico},
+            {"endpoint": "/api/v1/divide-pdf/", "sistema_processual": "PJE"},
+        ]
+        valido = json.dumps({"endpoint": "/api/v1/divide-pdf/", "sistema_processual": "PJE", "sintetico": sintetico})
+        for registro in casos:
+            with self.subTest(registro=registro):
+                with self.assertRaisesRegex(ValueError, "^Linha 3:"):
+                    read_traffic(self.write(valido, "", json.dumps(registro)))
+
+        self.assertEqual(len(read_traffic(self.write(valido, "", valido))), 2)
+
+    def test_record_and_read(self):
+        caminho = os.path.join(self.temp_dir, "trafego.jsonl")
+        pdf = sample_pdf("PJE")
+        for endpoint, parametros in (
+            ("/api/v1/pdf-processor/", {"stream": "1"}),
+            ("/api/v1/divide-pdf/", {"formato": "indexado"}),
+        ):
+            record_call(
+                caminho, endpoint, "PJE", "processo.pdf", SimpleUploadedFile("processo.pdf", pdf), 200, 0.5, parametros
+            )
+
+        registros = read_traffic(caminho)
+        self.assertEqual(
+            [(r["endpoint"], r["parametros"], r["nome_arquivo"], r["status"]) for r in registros],
+            [
+                ("/api/v1/pdf-processor/", {"stream": "1"}, "processo.pdf", 200),
+                ("/api/v1/divide-pdf/", {"formato": "indexado"}, "processo.pdf", 200),
+            ],
+        )
+        # O mesmo PDF é guardado uma única vez
+        self.assertEqual(os.listdir(os.path.join(self.temp_dir, "pdfs")), [f"{hashlib.sha256(pdf).hexdigest()}.pdf"])
+        self.assertEqual(load_payload(registros[0], self.temp_dir, {}), pdf)
+
+
+class TrafficRecorderTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.record_file = os.path.join(self.temp_dir, "trafego.jsonl")
+        configuracao = override_settings(
+            LOADTEST_RECORD_FILE=self.record_file,
+            UPLOAD_DIR=os.path.join(self.temp_dir, "uploads"),
+            TEMP_DIR=os.path.join(self.temp_dir, "workspaces"),
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        # O middleware é carregado pelo primeiro cliente criado com as configurações acima
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create(username="teste"))
+        self.pdf = sample_pdf("PJE")
+
+    def test_records_file_upload(self):
+        self.client.post("/api/v1/divide-pdf/", {
+            "file": SimpleUploadedFile("processo.pdf", self.pdf), "sistema_processual": "PJE", "formato": "manifesto",
+        }).close()
+
+        registro, = read_traffic(self.record_file)
+        self.assertEqual(registro["parametros"], {"formato": "manifesto"})
+        self.assertEqual(load_payload(registro, self.temp_dir, {}), self.pdf)
+
+    def test_records_committed_upload(self):
+        upload_id = self.client.post(
+            "/api/v1/uploads/", {"nome_arquivo": "enviado.pdf"}, format="json"
+        ).json()["upload_id"]
+        self.client.generic(
+            "PUT", f"/api/v1/uploads/{upload_id}/", self.pdf,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET="0",
+        )
+        self.client.post(f"/api/v1/uploads/{upload_id}/commit/")
+
+        response = self.client.post("/api/v1/pdf-processor/", {"upload_id": upload_id, "sistema_processual": "PJE"})
+        self.assertEqual(response.status_code, 200)
+
+        registro, = read_traffic(self.record_file)
+        self.assertEqual(registro["nome_arquivo"], "enviado.pdf")
+        self.assertEqual(load_payload(registro, self.temp_dir, {}), self.pdf)
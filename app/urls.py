@@ -18,10 +18,15 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from app.profiling import profile_download_view, profile_list_view
+
 urlpatterns = [
+    path("admin/profiles/", profile_list_view, name="profile_list"),
+    path("admin/profiles/<str:arquivo>/", profile_download_view, name="profile_download"),
     path("admin/", admin.site.urls),
     
     path("api/v1/", include("processor.urls")),
     path("api/v1/", include("authentication.urls")),
     path("api/v1/", include("divider.urls")),
+    path("api/v1/", include("uploads.urls")),
 ]
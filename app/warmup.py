@@ -0,0 +1,117 @@
+"""
+Aquecimento do worker antes de atender requisições.
+
+Importa os módulos pesados, compila os padrões de todos os processadores e passa
+um PDF mínimo por cada processador e divisor. Chamado pelo wsgi/asgi quando
+WARMUP_ON_STARTUP está ativo: com `gunicorn --preload` roda uma única vez no
+processo mestre e os workers herdam as páginas já aquecidas pelo fork.
+"""
+import gc
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HEAVY_MODULES = (
+    "rest_framework.views",
+    "rest_framework.parsers",
+    "rest_framework_simplejwt.authentication",
+    "pymupdf",
+    "processor.processors",
+    "divider.dividers",
+    "divider.views",
+    "processor.views",
+)
+
+
+def import_modules(modulos=HEAVY_MODULES):
+    """
+    Importa os módulos e retorna o tempo de importação de cada um, em segundos.
+    Módulos já importados aparecem com tempo zero.
+    """
+    tempos = {}
+    for modulo in modulos:
+        if modulo in sys.modules:
+            tempos[modulo] = 0.0
+            continue
+        inicio = time.perf_counter()
+        importlib.import_module(modulo)
+        tempos[modulo] = time.perf_counter() - inicio
+    return tempos
+
+
+def warm_processors(temp_dir):
+    from processor.registry import registry
+    from processor.samples import sample_pdf
+
+    tempos = {}
+    for nome in registry.names():
+        inicio = time.perf_counter()
+        processor = registry.get(nome)
+
+        pdf_path = os.path.join(temp_dir, f"warmup_{len(tempos)}.pdf")
+        with open(pdf_path, "wb") as arquivo:
+            arquivo.write(sample_pdf(nome))
+        processor.process(pdf_path)
+
+        tempos[nome] = time.perf_counter() - inicio
+    return tempos
+
+
+def warm_dividers(temp_dir):
+    from divider.dividers import EprocPdfDivider, GeneralPdfDivider
+    from processor.samples import sample_pdf
+
+    pdf_path = os.path.join(temp_dir, "warmup_divider.pdf")
+    with open(pdf_path, "wb") as arquivo:
+        arquivo.write(sample_pdf("PJE", eventos=1))
+    eventos = [{"numero_evento": "1", "pagina_inicial": 1, "pagina_final": 2, "data_evento": "01-01-2024"}]
+
+    tempos = {}
+    for divider in (GeneralPdfDivider(), EprocPdfDivider()):
+        nome = type(divider).__name__
+        inicio = time.perf_counter()
+        try:
+            divider.divide_pdf(pdf_path, eventos, tempfile.mkdtemp(dir=temp_dir), "warmup")
+        except ImportError as e:
+            # Extensão C++ do eproc não compilada neste ambiente
+            logger.warning(f"Aquecimento de {nome} ignorado: {e}")
+            continue
+        tempos[nome] = time.perf_counter() - inicio
+    return tempos
+
+
+def warm_up(freeze=True, django_setup=None):
+    """
+    Executa o aquecimento e retorna os tempos de cada etapa, em segundos.
+    `django_setup` é o tempo de carga da aplicação Django, medido por quem a carregou.
+    """
+    inicio = time.perf_counter()
+    relatorio = {"imports": import_modules()}
+    if django_setup is not None:
+        relatorio["imports"] = {"django.setup": django_setup, **relatorio["imports"]}
+
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=settings.TEMP_DIR) as temp_dir:
+        relatorio["processors"] = warm_processors(temp_dir)
+        relatorio["dividers"] = warm_dividers(temp_dir)
+
+    if freeze:
+        # Move os objetos criados até aqui para fora do coletor: depois do fork,
+        # o gc não toca nessas páginas e elas continuam compartilhadas entre os workers.
+        gc.collect()
+        gc.freeze()
+
+    relatorio["total"] = time.perf_counter() - inicio
+
+    for modulo, tempo in relatorio["imports"].items():
+        logger.info(f"Importação de {modulo}: {tempo * 1000:.1f} ms")
+    logger.info(f"Aquecimento concluído em {relatorio['total'] * 1000:.1f} ms")
+
+    return relatorio
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class TokenCache:
+    """
+    Cache LRU, limitado em tamanho e com TTL, de tokens cuja assinatura e claims já
+    foram verificados. Um token não muda depois de emitido, então o cache pode ser
+    por processo; o usuário fica no cache compartilhado (ver `user_cache_key`).
+    """
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            entrada = self._entries.get(chave)
+            if entrada is None:
+                return None
+            token, expira_em = entrada
+            if expira_em <= time.time():
+                del self._entries[chave]
+                return None
+            self._entries.move_to_end(chave)
+            return token
+
+    def set(self, chave, token):
+        expira_em = time.time() + self.ttl
+        # Nunca além da expiração do próprio token
+        if token.get("exp"):
+            expira_em = min(expira_em, token["exp"])
+
+        with self._lock:
+            self._entries[chave] = (token, expira_em)
+            self._entries.move_to_end(chave)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(settings.JWT_AUTH_CACHE_SIZE, settings.JWT_AUTH_CACHE_TTL)
+
+
+def user_cache_key(user_id):
+    return f"jwt_auth:user:{user_id}"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que reaproveita, por até JWT_AUTH_CACHE_TTL segundos, a
+    verificação da assinatura e dos claims de tokens já vistos e, por até
+    JWT_AUTH_USER_CACHE_TTL segundos, o usuário carregado do banco.
+
+    O usuário fica no cache do Django (CACHES), compartilhado entre os processos
+    quando configurado assim, e é removido ao ser salvo ou excluído (ver signals.py).
+    Alterações por `QuerySet.update()` não disparam sinais: valem quando a entrada
+    expira. A blacklist e a revogação por troca de senha são conferidas sempre.
+    """
+    def get_validated_token(self, raw_token):
+        if not settings.JWT_AUTH_CACHE_TTL:
+            return super().get_validated_token(raw_token)
+
+        chave = hashlib.sha256(raw_token).hexdigest()
+        token = token_cache.get(chave)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            token_cache.set(chave, token)
+        elif hasattr(token, "check_blacklist"):
+            # Tokens com blacklist (app token_blacklist instalado) são conferidos sempre
+            try:
+                token.check_blacklist()
+            except TokenError as e:
+                raise InvalidToken(e.args[0])
+        return token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if not settings.JWT_AUTH_USER_CACHE_TTL or user_id is None:
+            return super().get_user(validated_token)
+
+        chave = user_cache_key(user_id)
+        # O cache devolve uma cópia: cada requisição tem sua própria instância
+        user = cache.get(chave)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(chave, user, settings.JWT_AUTH_USER_CACHE_TTL)
+        elif api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import user_cache_key
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Remove o usuário do cache de autenticação: desativações, trocas de senha e
+    exclusões valem na próxima requisição.
+    """
+    cache.delete(user_cache_key(getattr(instance, api_settings.USER_ID_FIELD)))
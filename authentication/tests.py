@@ -0,0 +1,105 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.authentication import CachedJWTAuthentication, TokenCache, token_cache
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create(username="teste")
+        self.token = str(AccessToken.for_user(self.user))
+        self.authentication = CachedJWTAuthentication()
+
+    def authenticate(self):
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        return self.authentication.authenticate(request)
+
+    def test_signature_checked_once(self):
+        with mock.patch.object(
+            JWTAuthentication, "get_validated_token", autospec=True, side_effect=JWTAuthentication.get_validated_token
+        ) as validacao:
+            primeiro, _ = self.authenticate()
+            segundo, _ = self.authenticate()
+
+        self.assertEqual(validacao.call_count, 1)
+        self.assertEqual(primeiro.pk, self.user.pk)
+
+    def test_user_loaded_once(self):
+        primeiro, _ = self.authenticate()
+        with self.assertNumQueries(0):
+            segundo, _ = self.authenticate()
+
+        self.assertEqual(segundo.pk, self.user.pk)
+        # Cada requisição recebe sua própria instância do usuário
+        self.assertIsNot(primeiro, segundo)
+
+    def test_saved_deactivation_applies_immediately(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        get_user_model().objects.filter(pk=self.user.pk).delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(JWT_AUTH_USER_CACHE_TTL=30)
+    def test_queryset_deactivation_applies_after_ttl(self):
+        self.authenticate()
+        # update() não dispara sinais: o usuário em cache vale até expirar
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.authenticate()
+
+        with mock.patch("time.time", return_value=time.time() + 31), self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(JWT_AUTH_USER_CACHE_TTL=0)
+    def test_user_cache_disabled(self):
+        self.authenticate()
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class TokenCacheTests(TestCase):
+    def test_expires_after_ttl(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        cache.set("a", {})
+        self.assertEqual(cache.get("a"), {})
+
+        with mock.patch("authentication.authentication.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("a"))
+
+    def test_expires_with_token(self):
+        cache = TokenCache(max_entries=10, ttl=60)
+        cache.set("a", {"exp": time.time() - 1})
+        self.assertIsNone(cache.get("a"))
+
+    def test_evicts_least_recently_used(self):
+        cache = TokenCache(max_entries=2, ttl=60)
+        cache.set("a", {})
+        cache.set("b", {})
+        cache.get("a")
+        cache.set("c", {})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {})
+        self.assertEqual(cache.get("c"), {})
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from divider.dividers import PdfDividerStrategy, output_filename
+from processor.guard import source_guard
+from processor.source import source_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactStore:
+    """
+    Armazena em disco os PDFs de eventos já gerados, indexados pelo hash do documento
+    de origem, pelo intervalo de páginas e pelo perfil de saída.
+
+    Cada acesso atualiza o mtime do artefato: os que ficam mais de `ttl` segundos sem
+    uso expiram, e quando o total passa de `max_bytes` os menos usados são removidos.
+    """
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._tamanho = None
+        self._lock = threading.Lock()
+
+    def key(self, source_hash, pagina_inicial, pagina_final, profile):
+        return hashlib.sha256(f"{source_hash}:{pagina_inicial}-{pagina_final}:{profile}".encode()).hexdigest()
+
+    def path(self, chave):
+        return os.path.join(self.directory, chave[:2], f"{chave}.pdf")
+
+    def fetch(self, chave, destino):
+        """
+        Coloca o artefato em `destino` (hardlink, ou cópia) e retorna True se ele existir.
+        """
+        caminho = self.path(chave)
+        try:
+            if time.time() - os.path.getmtime(caminho) > self.ttl:
+                self._remove(caminho)
+                return False
+            os.utime(caminho)
+            try:
+                os.link(caminho, destino)
+            except OSError:
+                shutil.copyfile(caminho, destino)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put(self, chave, arquivo):
+        caminho = self.path(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+        # Grava em um nome temporário e troca atomicamente: leitores nunca veem arquivo parcial
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(arquivo, temporario)
+
+        with self._lock:
+            # Misses concorrentes da mesma chave sobrescrevem o artefato: conta só a diferença
+            try:
+                anterior = os.path.getsize(caminho)
+            except FileNotFoundError:
+                anterior = 0
+            os.replace(temporario, caminho)
+
+            if self._tamanho is None:
+                self._tamanho = self._scan_size()
+            else:
+                self._tamanho += os.path.getsize(caminho) - anterior
+            excedeu = self._tamanho > self.max_bytes
+
+        if excedeu:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove os artefatos expirados e, se necessário, os menos usados até 90% da cota.
+        """
+        agora = time.time()
+        artefatos = []
+        for caminho, stat in self._entries():
+            if agora - stat.st_mtime > self.ttl:
+                self._remove(caminho)
+            else:
+                artefatos.append((stat.st_mtime, stat.st_size, caminho))
+
+        artefatos.sort()
+        total = sum(tamanho for _, tamanho, _ in artefatos)
+        limite = self.max_bytes * 0.9
+        for _, tamanho, caminho in artefatos:
+            if total <= limite:
+                break
+            self._remove(caminho)
+            total -= tamanho
+
+        with self._lock:
+            self._tamanho = total
+        logger.info(f"Cache de artefatos com {total} bytes após a limpeza")
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for subdiretorio in os.scandir(self.directory):
+            if not subdiretorio.is_dir():
+                continue
+            for entrada in os.scandir(subdiretorio.path):
+                if entrada.name.endswith(".pdf"):
+                    try:
+                        yield entrada.path, entrada.stat()
+                    except FileNotFoundError:
+                        continue
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _remove(self, caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+class CachedPdfDivider(PdfDividerStrategy):
+    """
+    Envolve uma estratégia de divisão: os eventos já presentes no cache são servidos
+    do disco e apenas os faltantes são gerados (e guardados) pela estratégia original.
+    """
+    def __init__(self, divider, store):
+        self.divider = divider
+        self.store = store
+        self.output_profile = divider.output_profile
+
+    def divide_pdf(self, pdf_path, eventos, output_dir, nome_arquivo):
+        source_hash = source_sha256(pdf_path)
+        guard = source_guard(pdf_path)
+
+        destinos = {}
+        faltantes = []
+        for indice, evento in enumerate(eventos):
+            # Limite atingido: os eventos restantes ficam de fora
+            if not guard.check_event():
+                eventos = eventos[:indice]
+                break
+
+            chave = self.store.key(source_hash, evento["pagina_inicial"], evento["pagina_final"], self.output_profile)
+            destino = os.path.join(output_dir, output_filename(nome_arquivo, evento))
+            destinos[id(evento)] = (chave, destino)
+            if self.store.fetch(chave, destino):
+                guard.add_output(destino)
+            else:
+                faltantes.append(evento)
+
+        logger.info(f"Cache de artefatos: {len(eventos) - len(faltantes)} de {len(eventos)} eventos reaproveitados")
+
+        gerados = set(self.divider.divide_pdf(pdf_path, faltantes, output_dir, nome_arquivo)) if faltantes else set()
+        for evento in faltantes:
+            chave, destino = destinos[id(evento)]
+            if destino in gerados and os.path.exists(destino):
+                try:
+                    self.store.put(chave, destino)
+                except OSError as e:
+                    logger.error(f"Erro ao guardar artefato do evento {evento.get('numero_evento')}: {e}")
+
+        # Mesma ordem e mesmo contrato da estratégia original: apenas os arquivos existentes
+        arquivos = [destinos[id(evento)][1] for evento in eventos]
+        return [arquivo for arquivo in arquivos if os.path.exists(arquivo)]
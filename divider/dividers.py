@@ -3,17 +3,40 @@ import logging
 import os
 import subprocess
 import tempfile
-import pymupdf
 
-from app.extensions import pdf_divider
 from django.conf import settings
 
+from processor.guard import source_guard
+from processor.source import mupdf_lock, open_document, source_path
+
 logger = logging.getLogger(__name__)
 
+def safe_filename(nome_arquivo):
+    """
+    Só a parte final do nome enviado pelo cliente, para que os arquivos gerados não
+    saiam do diretório de saída.
+    """
+    nome = os.path.basename(nome_arquivo or "")
+    if nome in ("", ".", ".."):
+        raise ValueError("Nome de arquivo inválido.")
+    return nome
+
+def output_filename(nome_arquivo, evento):
+    """
+    Nome do PDF gerado para um evento.
+    """
+    return (
+        f"{safe_filename(nome_arquivo)}_evento_{evento['numero_evento']}_pgInicial_{evento['pagina_inicial']}"
+        f"_pgFinal_{evento['pagina_final']}_{evento['data_evento']}.pdf"
+    )
+
 class PdfDividerStrategy:
     """
     Classe base abstrata para diferentes estratégias de divisão de PDF.
     """
+    # Identifica o formato dos arquivos gerados; compõe a chave do cache de artefatos
+    output_profile = None
+
     def divide_pdf(self, pdf_path, eventos, output_dir, nome_arquivo):
         raise NotImplementedError("Subclasses devem implementar o método divide_pdf.")
 
@@ -21,38 +44,58 @@ class GeneralPdfDivider(PdfDividerStrategy):
     """
     Divisor de PDF padrão usando PyMuPDF.
     """
+    output_profile = "pymupdf-deflate"
+
     def divide_pdf(self, pdf_path, eventos, output_dir, nome_arquivo):
-        doc = pymupdf.open(pdf_path)
+        with open_document(pdf_path) as doc:
+            return self.divide_document(doc, eventos, output_dir, nome_arquivo, source_guard(pdf_path))
+
+    def divide_document(self, doc, eventos, output_dir, nome_arquivo, guard=None):
+        import pymupdf
+
+        guard = guard or source_guard(None)
         arquivos_gerados = []
 
         for evento in eventos:
+            # Limite atingido: os eventos restantes ficam de fora
+            if not guard.check_event():
+                break
+
             try:
-                numero_evento = evento.get("numero_evento")
                 pagina_inicial = evento.get("pagina_inicial") - 1
                 pagina_final = evento.get("pagina_final") - 1
-                data_evento = evento.get("data_evento")
 
-                novo_pdf = pymupdf.open()
-                for pagina_num in range(pagina_inicial, pagina_final + 1):
-                    novo_pdf.insert_pdf(doc, from_page=pagina_num, to_page=pagina_num)
+                output_pdf = os.path.join(output_dir, output_filename(nome_arquivo, evento))
 
-                output_pdf = os.path.join(
-                    output_dir,
-                    f"{nome_arquivo}_evento_{numero_evento}_pgInicial_{pagina_inicial + 1}_pgFinal_{pagina_final + 1}_{data_evento}.pdf",
-                )
+                with mupdf_lock:
+                    novo_pdf = pymupdf.open()
+                    for pagina_num in range(pagina_inicial, pagina_final + 1):
+                        novo_pdf.insert_pdf(doc, from_page=pagina_num, to_page=pagina_num)
 
-                novo_pdf.save(output_pdf, deflate=True)
-                novo_pdf.close()
+                    novo_pdf.save(output_pdf, deflate=True)
+                    novo_pdf.close()
+
+                guard.add_output(output_pdf)
                 arquivos_gerados.append(output_pdf)
 
-            except Exception as e:
-                print(f"Erro ao processar evento {evento.get('numero_evento')}: {e}")
+            except Exception:
+                logger.exception(f"Erro ao processar evento {evento.get('numero_evento')}")
+                guard.record_failure(evento.get("numero_evento"))
 
-        doc.close()
         return arquivos_gerados
 
 class EprocPdfDivider(PdfDividerStrategy):
+    output_profile = "poppler-cairo"
+
     def divide_pdf(self, pdf_path, eventos, output_dir, nome_arquivo):
+        # A extensão C++ só é carregada quando um PDF do eproc é dividido
+        from app.extensions import pdf_divider
+
+        # A extensão divide todos os eventos de uma vez: os limites são verificados antes e depois
+        guard = source_guard(pdf_path)
+        if not guard.check_event():
+            return []
+
         logger.info("Chamando extensão C++...")
         arquivos_gerados = []
 
@@ -62,19 +105,20 @@ class EprocPdfDivider(PdfDividerStrategy):
             (
                 evento["pagina_inicial"],
                 evento["pagina_final"],
-                f"{nome_arquivo}_evento_{evento['numero_evento']}_pgInicial_{evento['pagina_inicial']}_pgFinal_{evento['pagina_final']}_{evento['data_evento']}.pdf",
+                output_filename(nome_arquivo, evento),
             )
             for evento in eventos
         ]
 
         # Chama a extensão C++ para dividir o PDF
-        pdf_divider.divide_pdf(pdf_path, output_dir, eventos_tuplas)
+        pdf_divider.divide_pdf(source_path(pdf_path), output_dir, eventos_tuplas)
         logger.info("Extensão C++ chamada com sucesso!")
 
 
         # Adiciona os PDFs gerados à lista de arquivos
         for _, _, output_file in eventos_tuplas:
-            arquivos_gerados.append(os.path.join(temp_output_dir, output_file))
+            arquivos_gerados.append(os.path.join(output_dir, output_file))
+            guard.add_output(arquivos_gerados[-1])
 
         return arquivos_gerados
     
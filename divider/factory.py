@@ -1,4 +1,7 @@
 
+from django.conf import settings
+
+from divider.cache import ArtifactStore, CachedPdfDivider
 from divider.dividers import EprocPdfDivider, GeneralPdfDivider
 
 
@@ -7,6 +10,22 @@ class PdfDividerFactory:
     @staticmethod
     def get_divider(sistema_processual):
         if sistema_processual.lower() == "eproc":
-            return EprocPdfDivider()
+            divider = EprocPdfDivider()
         else:
-            return GeneralPdfDivider()
\ No newline at end of file
+            divider = GeneralPdfDivider()
+
+        if settings.ARTIFACT_CACHE_ENABLED:
+            return CachedPdfDivider(divider, get_artifact_store())
+        return divider
+
+
+_artifact_store = None
+
+
+def get_artifact_store():
+    global _artifact_store
+    if _artifact_store is None:
+        _artifact_store = ArtifactStore(
+            settings.ARTIFACT_CACHE_DIR, settings.ARTIFACT_CACHE_MAX_BYTES, settings.ARTIFACT_CACHE_TTL
+        )
+    return _artifact_store
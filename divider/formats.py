@@ -0,0 +1,112 @@
+"""
+Formatos de saída da divisão.
+
+- zip: um PDF por evento, compactados (padrão).
+- manifesto: ZIP com manifesto.json (intervalo de páginas de cada evento) e o PDF
+  original, sem dividir nem recomprimir o documento.
+- indexado: o PDF original com um marcador (bookmark) por evento.
+
+Os dois últimos não serializam um PDF por evento, então a resposta é menor (fontes
+e recursos compartilhados não são repetidos) e sai bem mais rápido; servem a clientes
+que só precisam navegar pelos eventos.
+"""
+import json
+import os
+import shutil
+import zipfile
+
+from divider.dividers import safe_filename
+from processor.guard import source_guard
+from processor.source import mupdf_lock, open_document, source_path
+
+FORMATO_ZIP = "zip"
+FORMATO_MANIFESTO = "manifesto"
+FORMATO_INDEXADO = "indexado"
+FORMATOS = (FORMATO_ZIP, FORMATO_MANIFESTO, FORMATO_INDEXADO)
+
+
+def base_name(nome_arquivo):
+    """
+    Nome sem diretórios e sem a extensão .pdf, que pode vir do nome do arquivo enviado.
+    """
+    nome = safe_filename(nome_arquivo)
+    raiz, extensao = os.path.splitext(nome)
+    return raiz if extensao.lower() == ".pdf" else nome
+
+
+def bookmark_title(evento):
+    if evento.get("data_evento"):
+        return f"Evento {evento['numero_evento']} ({evento['data_evento']})"
+    return f"Evento {evento['numero_evento']}"
+
+
+def total_pages(source):
+    with open_document(source) as doc:
+        with mupdf_lock:
+            return len(doc)
+
+
+def build_manifest(source, eventos, nome_arquivo, sistema_processual):
+    guard = source_guard(source)
+    return {
+        "arquivo": f"{base_name(nome_arquivo)}.pdf",
+        "sistema_processual": sistema_processual,
+        "status": guard.status,
+        "limite": guard.limite,
+        "total_paginas": total_pages(source),
+        "eventos": [
+            {
+                "numero_evento": evento["numero_evento"],
+                "pagina_inicial": evento["pagina_inicial"],
+                "pagina_final": evento["pagina_final"],
+                "data_evento": evento["data_evento"],
+            }
+            for evento in eventos
+        ],
+    }
+
+
+def criar_pacote_manifesto(source, eventos, output_dir, nome_arquivo, sistema_processual):
+    """
+    Cria um ZIP com o manifesto dos eventos e o PDF original.
+    """
+    manifesto = build_manifest(source, eventos, nome_arquivo, sistema_processual)
+    zip_path = os.path.join(output_dir, f"{base_name(nome_arquivo)}_manifesto.zip")
+
+    with zipfile.ZipFile(zip_path, "w") as zipf:
+        zipf.writestr(
+            "manifesto.json",
+            json.dumps(manifesto, ensure_ascii=False, indent=2),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+        # O conteúdo do PDF já é comprimido: armazenar evita gastar CPU sem ganho de tamanho
+        zipf.write(source_path(source), manifesto["arquivo"], compress_type=zipfile.ZIP_STORED)
+
+    return zip_path
+
+
+def criar_pdf_indexado(source, eventos, output_dir, nome_arquivo):
+    """
+    Copia o PDF original e substitui seus marcadores por um por evento. A cópia é
+    aberta em um handle próprio (o documento compartilhado não é alterado) e, quando
+    possível, salva de forma incremental, acrescentando só os objetos dos marcadores.
+    """
+    import pymupdf
+
+    output_pdf = os.path.join(output_dir, f"{base_name(nome_arquivo)}_indexado.pdf")
+    shutil.copyfile(source_path(source), output_pdf)
+
+    toc = [[1, bookmark_title(evento), evento["pagina_inicial"]] for evento in eventos]
+
+    with mupdf_lock, pymupdf.open(output_pdf) as doc:
+        doc.set_toc(toc)
+        if doc.can_save_incrementally():
+            doc.saveIncr()
+            return output_pdf
+
+        # Documento reparado na abertura: precisa ser reescrito por inteiro
+        reescrito = os.path.join(output_dir, f"{base_name(nome_arquivo)}_indexado_completo.pdf")
+        doc.save(reescrito, garbage=1, deflate=True)
+
+    os.replace(reescrito, output_pdf)
+    return output_pdf
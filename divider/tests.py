@@ -1,3 +1,405 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import pymupdf
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from divider.cache import ArtifactStore, CachedPdfDivider
+from divider import factory
+from divider.dividers import GeneralPdfDivider, output_filename
+from divider.formats import FORMATO_INDEXADO, FORMATOS, base_name, criar_pacote_manifesto, criar_pdf_indexado
+from processor import guard as guard_module
+from processor.guard import LIMITE_BYTES_SAIDA, LIMITE_MEMORIA, LIMITE_PAGINAS, ResourceGuard
+from processor.golden import GOLDEN_CORPUS, write_golden_pdf
+from processor.registry import registry
+from processor.samples import sample_pdf
+from processor.source import PdfSource, mupdf_lock
+from processor.testing import TempDirTestCase
+
+THREADS = 8
+SPLITS = 32
+
+# Vazão mínima da divisão, bem abaixo da medida atual (ver processor/tests.py)
+MIN_PAGINAS_POR_SEGUNDO = 500
+THROUGHPUT_EVENTOS = 100
+THROUGHPUT_PAGINAS_POR_EVENTO = 5
+
+
+def page_texts(pdf_path):
+    with mupdf_lock, pymupdf.open(pdf_path) as doc:
+        return [pagina.get_text() for pagina in doc]
+
+
+class GoldenSplitTests(TempDirTestCase):
+    """
+    Cada arquivo gerado contém exatamente as páginas do seu evento no corpus de referência.
+    """
+    def test_split(self):
+        for sistema in GOLDEN_CORPUS:
+            with self.subTest(sistema=sistema):
+                pdf_path, esperado = write_golden_pdf(sistema, self.temp_dir)
+                output_dir = tempfile.mkdtemp(dir=self.temp_dir)
+                arquivos = GeneralPdfDivider().divide_pdf(pdf_path, esperado, output_dir, sistema)
+
+                paginas = page_texts(pdf_path)
+                self.assertEqual(len(arquivos), len(esperado))
+                for evento, arquivo in zip(esperado, arquivos):
+                    self.assertEqual(
+                        page_texts(arquivo),
+                        paginas[evento["pagina_inicial"] - 1:evento["pagina_final"]],
+                        arquivo,
+                    )
+
+    def test_pages_per_second(self):
+        pdf_path = os.path.join(self.temp_dir, "vazao.pdf")
+        with open(pdf_path, "wb") as arquivo:
+            arquivo.write(sample_pdf("PJE", THROUGHPUT_EVENTOS, THROUGHPUT_PAGINAS_POR_EVENTO))
+        eventos = registry.get("PJE").process(pdf_path)
+
+        inicio = time.perf_counter()
+        arquivos = GeneralPdfDivider().divide_pdf(pdf_path, eventos, tempfile.mkdtemp(dir=self.temp_dir), "vazao")
+        paginas_por_segundo = THROUGHPUT_EVENTOS * THROUGHPUT_PAGINAS_POR_EVENTO / (time.perf_counter() - inicio)
+
+        self.assertEqual(len(arquivos), THROUGHPUT_EVENTOS)
+        self.assertGreaterEqual(paginas_por_segundo, MIN_PAGINAS_POR_SEGUNDO, f"{paginas_por_segundo:.0f} páginas/s")
+
+
+class OutputFormatTests(TempDirTestCase):
+    def test_manifest(self):
+        pdf_path, esperado = write_golden_pdf("E-proc", self.temp_dir)
+        zip_path = criar_pacote_manifesto(pdf_path, esperado, self.temp_dir, "processo", "E-proc")
+
+        with zipfile.ZipFile(zip_path) as zipf:
+            manifesto = json.loads(zipf.read("manifesto.json"))
+            original = zipf.read("processo.pdf")
+
+        self.assertEqual(manifesto["total_paginas"], len(GOLDEN_CORPUS["E-proc"][0]))
+        self.assertEqual(manifesto["eventos"], esperado)
+        with open(pdf_path, "rb") as arquivo:
+            self.assertEqual(original, arquivo.read())
+
+    def test_indexed_pdf(self):
+        pdf_path, esperado = write_golden_pdf("TJSE", self.temp_dir)
+        output_dir = tempfile.mkdtemp(dir=self.temp_dir)
+
+        with PdfSource(pdf_path) as source:
+            indexado = criar_pdf_indexado(source, esperado, output_dir, "processo")
+
+        self.assertEqual(page_texts(indexado), page_texts(pdf_path))
+        with mupdf_lock, pymupdf.open(indexado) as doc:
+            self.assertEqual(
+                doc.get_toc(),
+                [[1, "Evento 1 (20-05-2019)", 1], [1, "Evento 2 (21-05-2019)", 4], [1, "Evento 3", 6]],
+            )
+        with mupdf_lock, pymupdf.open(pdf_path) as doc:
+            self.assertEqual(doc.get_toc(), [])
+
+
+class GuardedSplitTests(TempDirTestCase):
+    def test_output_bytes_limit(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        guard = ResourceGuard(max_bytes_saida=1)
+
+        with PdfSource(pdf_path, guard=guard) as source:
+            arquivos = GeneralPdfDivider().divide_pdf(source, esperado, self.temp_dir, "processo")
+
+        # O primeiro arquivo já ultrapassa o limite: os demais eventos não são gerados
+        self.assertEqual(len(arquivos), 1)
+        self.assertEqual(guard.limite, LIMITE_BYTES_SAIDA)
+
+    def test_memory_limit_during_split(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        guard = ResourceGuard(max_memoria=1000)
+
+        # O RSS ultrapassa o limite depois do primeiro evento
+        with mock.patch.object(guard_module, "INTERVALO_MEMORIA", 0), \
+                mock.patch.object(guard_module, "current_rss", side_effect=[500, 2000, 500]), \
+                PdfSource(pdf_path, guard=guard) as source:
+            arquivos = GeneralPdfDivider().divide_pdf(source, esperado, self.temp_dir, "processo")
+
+        self.assertEqual(len(arquivos), 1)
+        self.assertEqual(guard.limite, LIMITE_MEMORIA)
+
+    def test_memory_limit_from_extraction_does_not_stop_split(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        guard = ResourceGuard(max_memoria=1000)
+        guard.trip(LIMITE_MEMORIA)
+
+        # Com o RSS de volta abaixo do limite, os eventos já encontrados são gerados
+        with mock.patch.object(guard_module, "INTERVALO_MEMORIA", 0), \
+                mock.patch.object(guard_module, "current_rss", return_value=500), \
+                PdfSource(pdf_path, guard=guard) as source:
+            arquivos = GeneralPdfDivider().divide_pdf(source, esperado, self.temp_dir, "processo")
+
+        self.assertEqual(len(arquivos), len(esperado))
+        self.assertEqual(guard.limites, [LIMITE_MEMORIA])
+
+    def test_failed_event_is_recorded(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        eventos = [dict(esperado[0]), dict(esperado[1], pagina_inicial=None), dict(esperado[2])]
+        guard = ResourceGuard()
+
+        with PdfSource(pdf_path, guard=guard) as source, self.assertLogs("divider.dividers", "ERROR"):
+            arquivos = GeneralPdfDivider().divide_pdf(source, eventos, self.temp_dir, "processo")
+
+        self.assertEqual(len(arquivos), 2)
+        self.assertEqual(guard.falhas, ["2"])
+        self.assertEqual(guard.status, "concluido")
+        self.assertEqual(guard.headers()["X-Eventos-Com-Falha"], "2")
+
+
+class GuardedDivideViewTests(TempDirTestCase):
+    """
+    Com a extração interrompida pelo limite de páginas, a divisão ainda gera os eventos já encontrados.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username="teste"))
+
+    def divide(self):
+        pdf_path, _ = write_golden_pdf("PJE", self.temp_dir)
+        with open(pdf_path, "rb") as arquivo:
+            response = self.client.post(
+                "/api/v1/divide-pdf/", {"file": arquivo, "sistema_processual": "PJE", "nome_arquivo": "processo"}
+            )
+        conteudo = b"".join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as zipf:
+            return response, sorted(zipf.namelist())
+
+    def assert_partial_split(self):
+        response, arquivos = self.divide()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Guard-Status"], "parcial")
+        self.assertEqual(response["X-Guard-Limit"], LIMITE_PAGINAS)
+        self.assertEqual(arquivos, [
+            "processo_evento_1_pgInicial_2_pgFinal_4_02-03-2023.pdf",
+            "processo_evento_2_pgInicial_5_pgFinal_5_15-04-2023.pdf",
+        ])
+
+    @override_settings(GUARD_MAX_PAGES=5, ARTIFACT_CACHE_ENABLED=False)
+    def test_page_limit(self):
+        self.assert_partial_split()
+
+    @override_settings(GUARD_MAX_PAGES=5, ARTIFACT_CACHE_ENABLED=True)
+    def test_page_limit_with_artifact_cache(self):
+        store = ArtifactStore(os.path.join(self.temp_dir, "artifacts"), max_bytes=10 * 1024 ** 2, ttl=3600)
+        with mock.patch.object(factory, "_artifact_store", store):
+            self.assert_partial_split()
+
+
+class OutputFileNameTests(TempDirTestCase):
+    """
+    O nome enviado pelo cliente não leva os arquivos gerados para fora do diretório da requisição.
+    """
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username="teste"))
+        self.workspace_root = os.path.join(self.temp_dir, "a", "b", "workspaces")
+        os.makedirs(self.workspace_root)
+
+    def divide(self, formato, nome_arquivo):
+        pdf_path, _ = write_golden_pdf("ESAJ", self.temp_dir)
+        with override_settings(TEMP_DIR=self.workspace_root), open(pdf_path, "rb") as arquivo:
+            response = self.client.post("/api/v1/divide-pdf/", {
+                "file": arquivo, "sistema_processual": "ESAJ", "formato": formato, "nome_arquivo": nome_arquivo,
+            })
+            if response.status_code == 200:
+                b"".join(response.streaming_content)
+                response.close()
+        return response
+
+    def stray_files(self):
+        return [
+            os.path.join(raiz, arquivo)
+            for raiz, _, arquivos in os.walk(self.temp_dir)
+            for arquivo in arquivos
+            if not arquivo.startswith("golden_")
+        ]
+
+    def test_directories_are_stripped(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                response = self.divide(formato, "../../../escaped")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.stray_files(), [])
+
+    def test_name_without_file_part_is_rejected(self):
+        for nome_arquivo in ("../", "..", "dir/"):
+            with self.subTest(nome_arquivo=nome_arquivo):
+                response = self.divide(FORMATO_INDEXADO, nome_arquivo)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.stray_files(), [])
+
+    def test_output_filename(self):
+        evento = {"numero_evento": "1", "pagina_inicial": 1, "pagina_final": 2, "data_evento": None}
+        self.assertEqual(output_filename("../x", evento), output_filename("x", evento))
+        self.assertEqual(base_name("/tmp/processo.pdf"), "processo")
+
+
+class ArtifactStoreTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = ArtifactStore(os.path.join(self.temp_dir, "artifacts"), max_bytes=1000, ttl=3600)
+
+    def artifact(self, nome, tamanho=300):
+        caminho = os.path.join(self.temp_dir, nome)
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(nome.encode().ljust(tamanho, b"\0"))
+        return caminho
+
+    def age(self, chave, segundos):
+        instante = time.time() - segundos
+        os.utime(self.store.path(chave), (instante, instante))
+
+    def test_hit_and_miss(self):
+        chave = self.store.key("hash", 1, 2, "perfil")
+        destino = os.path.join(self.temp_dir, "destino.pdf")
+        self.assertFalse(self.store.fetch(chave, destino))
+
+        self.store.put(chave, self.artifact("a.pdf"))
+        self.assertTrue(self.store.fetch(chave, destino))
+        with open(destino, "rb") as arquivo:
+            self.assertTrue(arquivo.read().startswith(b"a.pdf"))
+
+        # A chave depende do documento, das páginas e do perfil de saída
+        self.assertNotEqual(chave, self.store.key("hash", 1, 2, "outro"))
+        self.assertNotEqual(chave, self.store.key("hash", 1, 3, "perfil"))
+
+    def test_ttl_expiry(self):
+        chave = self.store.key("hash", 1, 2, "perfil")
+        self.store.put(chave, self.artifact("a.pdf"))
+        self.age(chave, 3601)
+
+        self.assertFalse(self.store.fetch(chave, os.path.join(self.temp_dir, "destino.pdf")))
+        self.assertFalse(os.path.exists(self.store.path(chave)))
+
+    def test_evicts_least_recently_used_down_to_90_percent(self):
+        chaves = [self.store.key("hash", pagina, pagina, "perfil") for pagina in range(4)]
+        for idade, chave in zip((30, 20, 10), chaves):
+            self.store.put(chave, self.artifact(f"{chave}.pdf"))
+            self.age(chave, idade)
+
+        # Usar o artefato mais antigo o torna o mais recente
+        self.assertTrue(self.store.fetch(chaves[0], os.path.join(self.temp_dir, "destino.pdf")))
+
+        # 4 x 300 bytes passa da cota de 1000: remove o menos usado, voltando a 900
+        self.store.put(chaves[3], self.artifact(f"{chaves[3]}.pdf"))
+
+        existentes = [os.path.exists(self.store.path(chave)) for chave in chaves]
+        self.assertEqual(existentes, [True, False, True, True])
+
+    def test_overwritten_artifact_is_counted_once(self):
+        chaves = [self.store.key("hash", pagina, pagina, "perfil") for pagina in range(3)]
+        for chave in chaves:
+            self.store.put(chave, self.artifact(f"{chave}.pdf"))
+
+        # Misses concorrentes da mesma chave gravam o artefato de novo
+        with mock.patch.object(self.store, "evict") as limpeza:
+            for _ in range(3):
+                self.store.put(chaves[0], self.artifact(f"{chaves[0]}.pdf"))
+            self.store.put(chaves[1], self.artifact(f"{chaves[1]}.pdf", tamanho=400))
+
+        limpeza.assert_not_called()
+        self.assertEqual(self.store._tamanho, 1000)
+
+    def test_cached_divider_generates_only_misses_in_order(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        gerador = GeneralPdfDivider()
+        divider = CachedPdfDivider(gerador, self.store)
+        self.store.max_bytes = 10 * 1024 ** 2
+
+        # Apenas o evento do meio já está no cache
+        aquecimento = tempfile.mkdtemp(dir=self.temp_dir)
+        divider.divide_pdf(pdf_path, esperado[1:2], aquecimento, "processo")
+
+        output_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        with mock.patch.object(gerador, "divide_pdf", wraps=gerador.divide_pdf) as divisoes:
+            arquivos = divider.divide_pdf(pdf_path, esperado, output_dir, "processo")
+
+        divisoes.assert_called_once()
+        self.assertEqual(divisoes.call_args.args[1], [esperado[0], esperado[2]])
+        self.assertEqual(arquivos, [os.path.join(output_dir, output_filename("processo", e)) for e in esperado])
+        paginas = page_texts(pdf_path)
+        for evento, arquivo in zip(esperado, arquivos):
+            self.assertEqual(page_texts(arquivo), paginas[evento["pagina_inicial"] - 1:evento["pagina_final"]])
+
+
+class ConcurrentSplitTests(TempDirTestCase):
+    """
+    Várias divisões simultâneas no mesmo processo, como em um worker com threads.
+    """
+    def setUp(self):
+        super().setUp()
+        # Cada PDF é gerado uma vez: sample_pdf produz bytes (e hashes) diferentes a cada chamada
+        self.pdfs = {}
+        for indice in range(SPLITS):
+            chave = self.document(indice)
+            if chave not in self.pdfs:
+                sistema, eventos_esperados = chave
+                self.pdfs[chave] = sample_pdf(sistema, eventos=eventos_esperados, paginas_por_evento=3)
+
+    def document(self, indice):
+        return registry.names()[indice % len(registry.names())], 2 + indice % 5
+
+    def split(self, indice, divider):
+        sistema, eventos_esperados = self.document(indice)
+
+        workspace = tempfile.mkdtemp(dir=self.temp_dir)
+        pdf_path = os.path.join(workspace, "entrada.pdf")
+        with open(pdf_path, "wb") as arquivo:
+            arquivo.write(self.pdfs[sistema, eventos_esperados])
+
+        with PdfSource(pdf_path) as source:
+            eventos = registry.get(sistema).process(source)
+            arquivos = divider.divide_pdf(source, eventos, workspace, f"req{indice}")
+
+        return sistema, eventos_esperados, eventos, arquivos
+
+    def assert_outputs(self, resultados):
+        for sistema, eventos_esperados, eventos, arquivos in resultados:
+            self.assertEqual(len(eventos), eventos_esperados, sistema)
+            self.assertEqual(len(arquivos), eventos_esperados, sistema)
+
+            for evento, arquivo in zip(eventos, arquivos):
+                paginas = evento["pagina_final"] - evento["pagina_inicial"] + 1
+                with mupdf_lock, pymupdf.open(arquivo) as doc:
+                    self.assertEqual(len(doc), paginas, arquivo)
+
+    def run_concurrently(self, divider):
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            return list(executor.map(lambda indice: self.split(indice, divider), range(SPLITS)))
+
+    def test_concurrent_splits(self):
+        self.assert_outputs(self.run_concurrently(GeneralPdfDivider()))
+
+    def test_concurrent_splits_with_artifact_cache(self):
+        store = ArtifactStore(os.path.join(self.temp_dir, "artifacts"), max_bytes=10 * 1024 ** 2, ttl=3600)
+        gerador = GeneralPdfDivider()
+        divider = CachedPdfDivider(gerador, store)
+
+        with mock.patch.object(gerador, "divide_pdf", wraps=gerador.divide_pdf) as divisoes:
+            self.assert_outputs(self.run_concurrently(divider))
+            self.assertGreater(divisoes.call_count, 0)
+
+            # A segunda rodada é servida inteiramente do cache, disputando os mesmos artefatos
+            divisoes.reset_mock()
+            with self.assertLogs("divider.cache", "INFO") as logs:
+                self.assert_outputs(self.run_concurrently(divider))
+
+        self.assertEqual(divisoes.call_count, 0)
+        self.assertEqual(len(logs.records), SPLITS)
+        for registro in logs.records:
+            reaproveitados, total = re.search(r"(\d+) de (\d+) eventos", registro.getMessage()).groups()
+            self.assertEqual(reaproveitados, total)
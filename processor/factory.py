@@ -0,0 +1,8 @@
+
+from processor.registry import registry
+
+
+class ProcessorFactory:
+
+    def get_processor(self, sistema_processual):
+        return registry.get(sistema_processual)
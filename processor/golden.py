@@ -0,0 +1,118 @@
+"""
+Corpus de referência dos processadores: documentos sintéticos de cada sistema
+processual e os eventos esperados, usados nos testes de regressão do processador
+e do divisor.
+"""
+import os
+
+from processor.samples import build_pdf, marker_page
+
+
+def evento(numero_evento, pagina_inicial, pagina_final, data_evento):
+    return {
+        "numero_evento": numero_evento,
+        "pagina_inicial": pagina_inicial,
+        "pagina_final": pagina_final,
+        "data_evento": data_evento,
+    }
+
+
+# Corpus de referência: páginas de cada documento sintético e os eventos que o
+# processador atual extrai dele. Cobre as regras de fronteira de cada sistema e
+# serve de base para qualquer reescrita do processamento.
+GOLDEN_CORPUS = {
+    # O evento vai até a página anterior ao próximo marcador (pagina_final = pagina_num - 1);
+    # páginas antes do primeiro marcador são ignoradas e o mesmo número de documento continua o evento.
+    "PJE": (
+        [
+            "Capa do processo",
+            marker_page("PJE", "101", "02/03/2023"),
+            "Conteúdo",
+            marker_page("PJE", "101", "02/03/2023"),
+            marker_page("PJE", "202", "15/04/2023"),
+            "Conteúdo",
+            "Conteúdo",
+        ],
+        [
+            evento("1", 2, 4, "02-03-2023"),
+            evento("2", 5, 7, "15-04-2023"),
+        ],
+    ),
+    # A página de separação não entra no evento (pagina_inicial += 1); separadores seguidos,
+    # separadores sem número do evento e um separador na última página não geram eventos.
+    "E-proc": (
+        [
+            "Capa do processo",
+            marker_page("E-proc", 1, "05/01/2022"),
+            "Conteúdo",
+            "Conteúdo",
+            marker_page("E-proc", 2, "06/01/2022"),
+            marker_page("E-proc", 3, "07/01/2022"),
+            "Conteúdo",
+            "PÁGINA DE SEPARAÇÃO\n(Gerada automaticamente)",
+            "Conteúdo",
+            marker_page("E-proc", 4, "08/01/2022"),
+        ],
+        [
+            evento("1", 3, 4, "05-01-2022"),
+            evento("2", 7, 7, "07-01-2022"),
+        ],
+    ),
+    "ESAJ": (
+        [
+            "Capa do processo",
+            marker_page("ESAJ", 1, "10/10/2020"),
+            "Conteúdo",
+            marker_page("ESAJ", 1, "10/10/2020"),
+            marker_page("ESAJ", 2, "11/10/2020"),
+            "Este documento é cópia do original, liberado nos autos em 12/10/2020 às 10:00, código 0000003A.",
+        ],
+        [
+            evento("1", 2, 4, "10-10-2020"),
+            evento("2", 5, 5, "11-10-2020"),
+            evento("3", 6, 6, "12-10-2020"),
+        ],
+    ),
+    # Datas nos formatos do PROJUDI GO e do PROJUDI AM/PR
+    "PROJUDI": (
+        [
+            marker_page("PROJUDI", 1, "01/02/2021"),
+            "Conteúdo",
+            marker_page("PROJUDI", 2, "03/02/2021"),
+            "Assinado em 04/02/2021: Validação deste documento: 00000003 ",
+            "Conteúdo",
+        ],
+        [
+            evento("1", 1, 2, "01-02-2021"),
+            evento("2", 3, 3, "03-02-2021"),
+            evento("3", 4, 5, "04-02-2021"),
+        ],
+    ),
+    # O último movimento não tem data
+    "TJSE": (
+        [
+            marker_page("TJSE", 1, "20/05/2019"),
+            "Conteúdo",
+            marker_page("TJSE", 1, "20/05/2019"),
+            marker_page("TJSE", 2, "21/05/2019"),
+            "Conteúdo",
+            "MOVIMENTO: Sentença\nsem data",
+        ],
+        [
+            evento("1", 1, 3, "20-05-2019"),
+            evento("2", 4, 5, "21-05-2019"),
+            evento("3", 6, 6, None),
+        ],
+    ),
+}
+
+
+def write_golden_pdf(sistema_processual, directory):
+    """
+    Grava o PDF do corpus de referência do sistema e retorna (caminho, eventos esperados).
+    """
+    paginas, esperado = GOLDEN_CORPUS[sistema_processual]
+    pdf_path = os.path.join(directory, f"golden_{sistema_processual}.pdf")
+    with open(pdf_path, "wb") as arquivo:
+        arquivo.write(build_pdf(paginas))
+    return pdf_path, esperado
@@ -0,0 +1,180 @@
+"""
+Limites de recursos por requisição.
+
+Cada requisição recebe um ResourceGuard, ligado ao seu PdfSource. As etapas o
+consultam de forma cooperativa, a cada página extraída e a cada evento gerado; ao
+estourar um limite, a etapa para onde está e a requisição devolve o resultado
+parcial, com o status indicando o limite atingido. Assim um PDF malformado ou
+enorme não prende o worker por minutos.
+
+A extração para em qualquer limite. A divisão confere, a cada evento, tempo,
+bytes de saída e memória; um limite de páginas ou de memória atingido durante a
+extração não a interrompe por si só: os eventos encontrados antes de a extração
+parar ainda são gerados, senão o resultado parcial ficaria vazio. Se o RSS
+continuar acima do limite durante a divisão, ela para.
+
+Limites (0 desativa):
+- GUARD_MAX_PAGES: páginas extraídas do documento.
+- GUARD_MAX_SECONDS: tempo de processamento, contado a partir da primeira verificação.
+- GUARD_MAX_RSS_BYTES: RSS do processo. Em workers com threads o RSS é compartilhado,
+  então é um teto do processo: a requisição que o encontra ultrapassado é interrompida.
+- GUARD_MAX_OUTPUT_BYTES: bytes dos arquivos gerados pela divisão.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LIMITE_PAGINAS = "paginas"
+LIMITE_TEMPO = "tempo"
+LIMITE_MEMORIA = "memoria"
+LIMITE_BYTES_SAIDA = "bytes_saida"
+
+STATUS_CONCLUIDO = "concluido"
+STATUS_PARCIAL = "parcial"
+
+# Intervalo mínimo, em segundos, entre leituras do RSS
+INTERVALO_MEMORIA = 0.1
+
+_trips = Counter()
+_trips_lock = threading.Lock()
+
+
+def record_trip(limite):
+    with _trips_lock:
+        _trips[limite] += 1
+        return _trips[limite]
+
+
+def trip_counts():
+    """
+    Quantas vezes cada limite foi atingido neste processo.
+    """
+    with _trips_lock:
+        return dict(_trips)
+
+
+def current_rss():
+    """
+    RSS atual do processo, em bytes, ou None fora do Linux.
+    """
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceGuard:
+    """
+    Limites de uma requisição. `check_page` e `check_event` retornam False quando a
+    etapa deve parar; os limites atingidos ficam em `limites`, o primeiro em `limite`.
+    """
+    def __init__(self, max_paginas=0, max_segundos=0, max_memoria=0, max_bytes_saida=0):
+        self.max_paginas = max_paginas
+        self.max_segundos = max_segundos
+        self.max_memoria = max_memoria
+        self.max_bytes_saida = max_bytes_saida
+
+        self.limites = []
+        self.bytes_saida = 0
+        self.falhas = []
+        self._inicio = None
+        self._ultima_memoria = 0
+        self._divisao_parada = False
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_paginas=settings.GUARD_MAX_PAGES,
+            max_segundos=settings.GUARD_MAX_SECONDS,
+            max_memoria=settings.GUARD_MAX_RSS_BYTES,
+            max_bytes_saida=settings.GUARD_MAX_OUTPUT_BYTES,
+        )
+
+    @property
+    def limite(self):
+        return self.limites[0] if self.limites else None
+
+    @property
+    def status(self):
+        return STATUS_PARCIAL if self.limite else STATUS_CONCLUIDO
+
+    def check_page(self, pagina_num):
+        """
+        Chamado antes de extrair a página `pagina_num` (a partir de 1).
+        """
+        if self.limites:
+            return False
+        if self.max_paginas and pagina_num > self.max_paginas:
+            return self.trip(LIMITE_PAGINAS)
+        return self.check_time() and self.check_memory()
+
+    def check_event(self):
+        """
+        Chamado antes de gerar o arquivo de um evento.
+        """
+        if self._divisao_parada:
+            return False
+        if self.max_bytes_saida and self.bytes_saida >= self.max_bytes_saida:
+            self.trip(LIMITE_BYTES_SAIDA)
+        elif self.check_time() and self.check_memory():
+            return True
+        # Depois de parar, a divisão não recomeça (a leitura do RSS é espaçada)
+        self._divisao_parada = True
+        return False
+
+    def add_output(self, arquivo):
+        self.bytes_saida += os.path.getsize(arquivo)
+
+    def record_failure(self, numero_evento):
+        self.falhas.append(numero_evento)
+
+    def headers(self):
+        """
+        Cabeçalhos HTTP com o status do processamento e, se houver, o limite atingido
+        e os eventos cuja geração falhou.
+        """
+        headers = {"X-Guard-Status": self.status}
+        if self.limite:
+            headers["X-Guard-Limit"] = ",".join(self.limites)
+        if self.falhas:
+            headers["X-Eventos-Com-Falha"] = ",".join(str(numero) for numero in self.falhas)
+        return headers
+
+    def check_time(self):
+        agora = time.monotonic()
+        if self._inicio is None:
+            self._inicio = agora
+
+        if self.max_segundos and agora - self._inicio > self.max_segundos:
+            return self.trip(LIMITE_TEMPO)
+        return True
+
+    def check_memory(self):
+        agora = time.monotonic()
+        if self.max_memoria and agora - self._ultima_memoria >= INTERVALO_MEMORIA:
+            self._ultima_memoria = agora
+            rss = current_rss()
+            if rss is not None and rss > self.max_memoria:
+                return self.trip(LIMITE_MEMORIA)
+        return True
+
+    def trip(self, limite):
+        if limite not in self.limites:
+            self.limites.append(limite)
+            total = record_trip(limite)
+            logger.warning(f"Limite de {limite} atingido; retornando resultado parcial ({total} no processo)")
+        return False
+
+
+def source_guard(source):
+    """
+    Guard do PdfSource, ou um sem limites para caminhos de arquivo.
+    """
+    return getattr(source, "guard", None) or ResourceGuard()
@@ -0,0 +1,172 @@
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from app import loadtest
+from processor.registry import registry
+
+# Prefixo do usuário temporário criado para cada execução e removido ao final
+USUARIO_STUB = "loadtest"
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe a aplicação localmente e reproduz chamadas gravadas (JSONL) ou sintéticas "
+        "aos endpoints de PDF, relatando latência, vazão, erros e RSS do servidor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--traffic", help="JSONL de tráfego (ver app/loadtest.py). Sem ele, usa tráfego sintético.")
+        parser.add_argument("--eventos", type=int, default=20, help="Eventos por PDF sintético.")
+        parser.add_argument("--paginas-por-evento", type=int, default=3, help="Páginas por evento nos PDFs sintéticos.")
+        parser.add_argument("--requests", type=int, help="Total de chamadas (padrão: uma por registro).")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--rate", type=float, default=0, help="Chamadas por segundo; 0 = sem limite.")
+        parser.add_argument("--timeout", type=float, default=300)
+        parser.add_argument("--server", help="URL de um servidor já em execução, em vez de subir um local.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--server-command",
+            help="Comando do servidor local, com {port} (padrão: manage.py runserver). "
+                 "Ex.: 'gunicorn app.wsgi -w 4 -b 127.0.0.1:{port}'.",
+        )
+        parser.add_argument("--output", help="Salva o relatório em JSON.")
+        parser.add_argument("--baseline", help="Relatório JSON de referência para comparação.")
+        parser.add_argument("--tolerance", type=float, default=0.1, help="Variação aceita na comparação (0.1 = 10%%).")
+        parser.add_argument("--fail-on-regression", action="store_true")
+        parser.add_argument(
+            "--token-lifetime", type=int, default=3600,
+            help="Validade, em segundos, do token do usuário temporário.",
+        )
+
+    def handle(self, *args, **options):
+        if options["traffic"]:
+            registros = loadtest.read_traffic(options["traffic"])
+            base_dir = os.path.dirname(os.path.abspath(options["traffic"]))
+        else:
+            registros = loadtest.synthetic_traffic(
+                registry.names(), options["eventos"], options["paginas_por_evento"]
+            )
+            base_dir = os.getcwd()
+
+        if not registros:
+            raise CommandError("Nenhuma chamada para reproduzir.")
+
+        usuario, token = self.stub_user(options["token_lifetime"])
+        servidor = None
+        base_url = options["server"]
+
+        try:
+            if not base_url:
+                servidor, base_url = self.start_server(options["port"], options["server_command"])
+
+            teste = loadtest.LoadTest(
+                base_url, token, registros, base_dir,
+                concorrencia=options["concurrency"],
+                taxa=options["rate"],
+                total=options["requests"],
+                timeout=options["timeout"],
+                server_pid=servidor.pid if servidor else None,
+            )
+            relatorio = teste.run()
+        finally:
+            if servidor:
+                servidor.terminate()
+                servidor.wait(timeout=30)
+            # Sem o usuário, o token emitido deixa de autenticar
+            usuario.delete()
+
+        self.print_report(relatorio)
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as arquivo:
+                json.dump(relatorio, arquivo, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as arquivo:
+                baseline = json.load(arquivo)
+            linhas = loadtest.compare(relatorio, baseline, options["tolerance"])
+            self.print_comparison(linhas)
+            if options["fail_on_regression"] and any(regressao for *_, regressao in linhas):
+                raise CommandError("Regressão em relação à baseline.")
+
+    def stub_user(self, validade):
+        """
+        Cria um usuário temporário, sem senha utilizável, e um token de acesso de curta
+        duração para ele. O usuário é removido ao fim da execução.
+        """
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        User = get_user_model()
+        usuario = User(username=f"{USUARIO_STUB}-{uuid.uuid4().hex[:12]}")
+        usuario.set_unusable_password()
+        try:
+            usuario.save()
+        except DatabaseError as e:
+            raise CommandError(f"Banco de dados indisponível ({e}). Rode 'manage.py migrate'.")
+
+        token = AccessToken.for_user(usuario)
+        token.set_exp(lifetime=timedelta(seconds=validade))
+        return usuario, str(token)
+
+    def start_server(self, port, comando=None):
+        if comando:
+            argumentos = shlex.split(comando.format(port=port))
+        else:
+            argumentos = [
+                sys.executable, os.path.join(settings.BASE_DIR, "manage.py"),
+                "runserver", "--noreload", f"127.0.0.1:{port}",
+            ]
+
+        servidor = subprocess.Popen(argumentos, cwd=settings.BASE_DIR)
+
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            if servidor.poll() is not None:
+                raise CommandError("O servidor local encerrou durante a inicialização.")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return servidor, f"http://127.0.0.1:{port}"
+            except OSError:
+                time.sleep(0.2)
+
+        servidor.terminate()
+        raise CommandError("O servidor local não respondeu a tempo.")
+
+    def print_report(self, relatorio):
+        self.stdout.write(
+            f"Duração: {relatorio['duracao']:.1f} s | concorrência: {relatorio['concorrencia']} "
+            f"| taxa: {relatorio['taxa'] or 'sem limite'}"
+        )
+        for nome, resumo in [("geral", relatorio["geral"]), *relatorio["endpoints"].items()]:
+            latencias = " ".join(
+                f"{percentil}={valor * 1000:.0f}ms" if valor is not None else f"{percentil}=-"
+                for percentil, valor in resumo["latencia"].items()
+            )
+            self.stdout.write(
+                f"{nome:<24} chamadas={resumo['chamadas']} erros={resumo['erros']} "
+                f"({resumo['taxa_erro']:.1%}) vazão={resumo['vazao']:.2f}/s {latencias}"
+            )
+
+        rss = relatorio["rss"]
+        if rss["amostras"]:
+            self.stdout.write(f"RSS do servidor: máx={rss['max'] / 2**20:.1f} MB final={rss['final'] / 2**20:.1f} MB")
+            for segundos, valor in rss["amostras"]:
+                self.stdout.write(f"  {segundos:>7.1f}s {valor / 2**20:8.1f} MB")
+
+    def print_comparison(self, linhas):
+        self.stdout.write("Comparação com a baseline:")
+        for nome, anterior, novo, variacao, regressao in linhas:
+            marcador = self.style.ERROR("REGRESSÃO") if regressao else "ok"
+            self.stdout.write(f"  {nome:<14} {anterior:>12.4g} -> {novo:<12.4g} {variacao:+.1%} {marcador}")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.warmup import warm_up
+
+
+class Command(BaseCommand):
+    requires_system_checks = []
+    help = "Aquece o processo (imports, padrões e PDFs mínimos) e relata os tempos de cada etapa."
+
+    def handle(self, *args, **options):
+        relatorio = warm_up(freeze=False)
+
+        for etapa in ("imports", "processors", "dividers"):
+            self.stdout.write(f"{etapa}:")
+            for nome, tempo in relatorio[etapa].items():
+                self.stdout.write(f"  {nome:<45} {tempo * 1000:9.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS(f"Total: {relatorio['total'] * 1000:.1f} ms"))
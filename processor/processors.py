@@ -0,0 +1,219 @@
+import bisect
+import re
+
+from processor.guard import source_guard
+from processor.registry import MARKER
+from processor.source import mupdf_lock, open_document
+
+# Separa os textos das páginas no buffer único de post_process; nenhuma regex de data casa com ele
+SEPARADOR_PAGINAS = "\x00"
+
+class ProcessorBase:
+    # Regex da data do evento, buscada na página marcadora que abriu o evento
+    date_pattern = None
+
+    def process(self, pdf_path):
+        texto_paginas = self.pdf_text_extract(pdf_path)
+        eventos = self.detect_events(texto_paginas)
+        return self.post_process(eventos, texto_paginas)
+
+    def detect_events(self, texto_paginas):
+        raise NotImplementedError("Subclasses devem implementar o método 'detect_events'.")
+
+    def stream(self, pdf_path):
+        """
+        Gera os eventos um a um. Por padrão, processa o documento inteiro antes;
+        processadores com máquina de estados incremental emitem cada evento ao fechá-lo.
+        """
+        yield from self.process(pdf_path)
+    
+    def extract_date(self, texto):
+        """
+        Extrai a data no formato DD-MM-YYYY de um texto.
+        """
+        if self.date_pattern is None:
+            raise NotImplementedError("Subclasses devem definir 'date_pattern'.")
+
+        match = self.date_pattern.search(texto)
+        if match:
+            return self.format_date(match)
+        return None
+
+    def format_date(self, match):
+        # Usa o primeiro grupo que casou (regex com alternativas, como a do PROJUDI)
+        data_evento = next(grupo for grupo in match.groups() if grupo)
+        return data_evento.replace("/", "-")
+
+    def extract_dates(self, texto_paginas, paginas):
+        """
+        Extrai a data de várias páginas de uma vez: junta os textos em um único buffer
+        e percorre as ocorrências, mapeando cada uma para sua página pelos offsets.
+        Retorna um dicionário {pagina: data}.
+        """
+        paginas = sorted(set(paginas))
+        if not paginas:
+            return {}
+
+        inicios = []
+        posicao = 0
+        for pagina in paginas:
+            inicios.append(posicao)
+            posicao += len(texto_paginas[pagina]) + len(SEPARADOR_PAGINAS)
+        buffer = SEPARADOR_PAGINAS.join(texto_paginas[pagina] for pagina in paginas)
+
+        datas = {}
+        posicao = 0
+        while True:
+            match = self.date_pattern.search(buffer, posicao)
+            if not match:
+                break
+
+            indice = bisect.bisect_right(inicios, match.start()) - 1
+            proxima = inicios[indice + 1] if indice + 1 < len(paginas) else len(buffer) + 1
+            pagina = paginas[indice]
+
+            if match.end() < proxima:
+                datas[pagina] = self.format_date(match)
+            else:
+                # A ocorrência atravessou o separador: busca apenas na página
+                data_evento = self.extract_date(texto_paginas[pagina])
+                if data_evento:
+                    datas[pagina] = data_evento
+
+            # Só interessa a primeira data de cada página
+            posicao = proxima
+
+        return datas
+
+    def iter_pages(self, pdf_path):
+        """
+        Gera (número da página, texto) à medida que as páginas são extraídas.
+        Para antes do fim do documento se um limite do guard for atingido.
+        """
+        guard = source_guard(pdf_path)
+        with open_document(pdf_path) as doc:
+            with mupdf_lock:
+                total_paginas = len(doc)
+            for pagina_num in range(total_paginas):
+                if not guard.check_page(pagina_num + 1):
+                    break
+                with mupdf_lock:
+                    texto = doc.load_page(pagina_num).get_text()
+                yield pagina_num + 1, texto
+
+    def pdf_text_extract(self, pdf_path):
+        return dict(self.iter_pages(pdf_path))
+    
+    def post_process(self, eventos, texto_paginas):
+        """
+        Etapa final comum a todos os processadores: preenche em lote a data de cada
+        evento a partir da sua página marcadora e numera os eventos com zeros à esquerda.
+        """
+        paginas = [evento.pop("pagina_marcador") for evento in eventos]
+        datas = self.extract_dates(texto_paginas, paginas)
+        num_digitos = len(str(len(eventos)))
+
+        for numero_evento, (evento, pagina) in enumerate(zip(eventos, paginas), start=1):
+            evento["numero_evento"] = f"{numero_evento:0{num_digitos}d}"
+            evento["data_evento"] = datas.get(pagina)
+
+        return eventos
+
+
+class SpecProcessor(ProcessorBase):
+    """
+    Máquina de estados genérica, compilada a partir de um SystemSpec.
+    Não guarda estado entre chamadas, então uma instância atende todas as requisições.
+    """
+    def __init__(self, spec):
+        self.spec = spec
+        self.marker_pattern = re.compile(spec.marker)
+        self.date_pattern = re.compile(spec.date)
+        self.key_pattern = re.compile(spec.key) if spec.key else None
+        self.new_event_on_every_marker = spec.boundary == MARKER
+
+    def event_key(self, match, texto):
+        """
+        Chave que identifica o evento da página marcadora.
+        """
+        if self.key_pattern is not None:
+            match = self.key_pattern.search(texto)
+            return match.group(1) if match else None
+
+        if match.re.groups:
+            return next((grupo for grupo in match.groups() if grupo), None)
+        return match.group(0)
+
+    def detect_events(self, texto_paginas):
+        return [evento for evento, _ in self.iter_events(texto_paginas.items())]
+
+    def stream(self, pdf_path):
+        """
+        Emite cada evento assim que a máquina de estados o fecha, já com a data.
+        A numeração é sequencial e sem zeros à esquerda, pois o total ainda não é conhecido.
+        """
+        eventos = self.iter_events(self.iter_pages(pdf_path))
+        for numero_evento, (evento, texto_marcador) in enumerate(eventos, start=1):
+            del evento["pagina_marcador"]
+            evento["numero_evento"] = str(numero_evento)
+            evento["data_evento"] = self.extract_date(texto_marcador)
+            yield evento
+
+    def iter_events(self, paginas):
+        """
+        Consome (número da página, texto) e gera (evento, texto da página marcadora)
+        para cada evento, na ordem em que são fechados.
+        """
+        evento_atual = None
+        chave_atual = None
+        texto_marcador = None
+        ultima_pagina = 0
+
+        for pagina_num, texto in paginas:
+            ultima_pagina = pagina_num
+
+            match = self.marker_pattern.search(texto)
+            if not match:
+                # Páginas sem marcador pertencem ao evento aberto
+                continue
+
+            chave = self.event_key(match, texto)
+
+            # Fecha o evento anterior na página que antecede o novo marcador
+            if evento_atual and (self.new_event_on_every_marker or chave != chave_atual):
+                if self.close_event(evento_atual, chave_atual, pagina_num - 1):
+                    yield evento_atual, texto_marcador
+                evento_atual = None
+
+            if not evento_atual:
+                evento_atual = {
+                    "numero_evento": None,
+                    "pagina_inicial": pagina_num,
+                    "pagina_final": None,
+                    "data_evento": None,
+                    "pagina_marcador": pagina_num,
+                }
+                chave_atual = chave
+                texto_marcador = texto
+
+        # O último evento vai até o fim do documento
+        if evento_atual and self.close_event(evento_atual, chave_atual, ultima_pagina):
+            yield evento_atual, texto_marcador
+
+    def close_event(self, evento, chave, pagina_final):
+        """
+        Fecha o evento em `pagina_final`. Retorna False se ele deve ser descartado.
+        """
+        # Descarta eventos sem chave (ex.: separador do eproc sem número do evento)
+        if chave is None:
+            return False
+
+        if self.spec.skip_marker_page:
+            evento["pagina_inicial"] += 1
+
+        # Descarta eventos vazios (ex.: dois separadores seguidos)
+        if evento["pagina_inicial"] > pagina_final:
+            return False
+
+        evento["pagina_final"] = pagina_final
+        return True
@@ -0,0 +1,139 @@
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Semânticas de fronteira entre eventos
+KEY_CHANGE = "key_change"  # marcadores com a mesma chave continuam o evento atual
+MARKER = "marker"          # todo marcador inicia um novo evento
+
+
+@dataclass(frozen=True)
+class SystemSpec:
+    """
+    Descrição declarativa de um sistema processual.
+
+    - marker: regex da página marcadora; o primeiro grupo que casar é a chave do evento.
+    - date: regex da data do evento, buscada na página marcadora.
+    - key: regex opcional da chave, quando ela não está no próprio marcador.
+    - boundary: KEY_CHANGE ou MARKER.
+    - skip_marker_page: a página marcadora não entra no evento (página de separação do eproc).
+    """
+    name: str
+    marker: str
+    date: str
+    key: str = None
+    boundary: str = KEY_CHANGE
+    skip_marker_page: bool = False
+
+
+SPECS = (
+    SystemSpec(
+        name="PJE",
+        marker=r"Número do documento:\s*(\d+)",
+        date=r"\s+-\s+((?:0[1-9]|[12][0-9]|3[01])[-/](?:0[1-9]|1[0-2])[-/](?:\d{4}))",
+    ),
+    SystemSpec(
+        name="E-proc",
+        marker=r"PÁGINA DE SEPARAÇÃO",
+        key=r"Evento (\d+)",
+        date=r"(\d{2}/\d{2}/\d{4})",
+        boundary=MARKER,
+        skip_marker_page=True,
+    ),
+    SystemSpec(
+        name="ESAJ",
+        marker=r"código\s([a-zA-Z0-9]{8}\.)",
+        date=r"(?:protocolado em|liberado nos autos em) (\d{2}/\d{2}/\d{4})",
+    ),
+    SystemSpec(
+        name="PROJUDI",
+        # Regex para PROJUDI AM, BA, GO, PR (talvez seja necessário implementar para outros estados)
+        marker=(
+            r"documento:\s([a-zA-Z0-9]{8}\s)|"
+            r"código:\s([0-9]{27}\,)|"
+            r"- Identificador:\s([A-Z0-9]{5}\s[A-Z0-9]{5}\s[A-Z0-9]{5}\s[A-Z0-9]{5})"
+        ),
+        # OBS: PROJUDI BA não tem data de publicação do evento no PDF
+        date=(
+            r"Publicado Digitalmente em (\d{2}/\d{2}/\d{4})|" # PROJUDI GO
+            r"(\d{2}/\d{2}/\d{4}):" # PROJUDI AM e PR
+        ),
+    ),
+    SystemSpec(
+        name="TJSE",
+        marker=r"MOVIMENTO:\s+(.+)",
+        date=r"DATA:\s+(\d{2}/\d{2}/\d{4})",
+    ),
+)
+
+NOT_IMPLEMENTED = ("Creta", "Gov.br", "Siscad", "Tucujuris")
+
+
+class ProcessorRegistry:
+    """
+    Registro dos processadores por sistema processual.
+
+    Cada entrada é um SystemSpec, o caminho de um plugin ("modulo.Objeto", que pode
+    ser um SystemSpec ou uma subclasse de ProcessorBase) ou None para sistemas
+    ainda não implementados. O processador só é carregado e compilado no primeiro
+    uso e depois reaproveitado por todas as requisições.
+    """
+    def __init__(self):
+        self._entries = {spec.name: spec for spec in SPECS}
+        self._entries.update(dict.fromkeys(NOT_IMPLEMENTED))
+        self._processors = {}
+        self._plugins_loaded = False
+        self._lock = threading.Lock()
+
+    def register(self, name, entry):
+        # Plugins carregados antes: o registro explícito prevalece sobre PROCESSOR_PLUGINS
+        self._load_plugins()
+        with self._lock:
+            self._entries[name] = entry
+            self._processors.pop(name, None)
+
+    def names(self):
+        self._load_plugins()
+        return [name for name, entry in self._entries.items() if entry is not None]
+
+    def get(self, name):
+        processor = self._processors.get(name)
+        if processor is not None:
+            return processor
+
+        self._load_plugins()
+        if name not in self._entries:
+            raise ValueError("Sistema desconhecido.")
+
+        entry = self._entries[name]
+        if entry is None:
+            raise NotImplementedError(f"Sistema {name} não implementado.")
+
+        with self._lock:
+            processor = self._processors.get(name)
+            if processor is None:
+                processor = self._processors[name] = self._build(entry)
+        return processor
+
+    def _load_plugins(self):
+        # Plugins declarados em settings.PROCESSOR_PLUGINS ({"Sistema": "modulo.Objeto"})
+        if self._plugins_loaded:
+            return
+        with self._lock:
+            if not self._plugins_loaded:
+                self._entries.update(getattr(settings, "PROCESSOR_PLUGINS", {}))
+                self._plugins_loaded = True
+
+    def _build(self, entry):
+        from processor.processors import SpecProcessor
+
+        if isinstance(entry, str):
+            entry = import_string(entry)
+        if isinstance(entry, SystemSpec):
+            return SpecProcessor(entry)
+        return entry()
+
+
+registry = ProcessorRegistry()
@@ -0,0 +1,55 @@
+"""
+PDFs sintéticos com as marcações de cada sistema processual, usados no
+aquecimento dos workers e em testes de carga.
+"""
+
+# Texto de uma página marcadora por sistema: recebe a chave do evento e a data (DD/MM/AAAA)
+MARKER_PAGES = {
+    "PJE": "Num. {chave} - Pág. 1\nNúmero do documento: {chave}\nAssinado eletronicamente - {data}",
+    "E-proc": "PÁGINA DE SEPARAÇÃO\n(Gerada automaticamente)\nEvento {chave}\nData: {data} 10:00:00",
+    "ESAJ": "Este documento é cópia do original, protocolado em {data} às 10:00, código {chave:0>7}A.",
+    "PROJUDI": "Publicado Digitalmente em {data}\nValidação deste documento: {chave:0>8} ",
+    "TJSE": "MOVIMENTO: Juntada de documento {chave}\nDATA:  {data}",
+}
+
+
+def marker_page(sistema_processual, chave, data="01/01/2024"):
+    """
+    Texto de uma página marcadora do sistema, ou None se não houver modelo para ele.
+    """
+    modelo = MARKER_PAGES.get(sistema_processual)
+    if modelo is None:
+        return None
+    return modelo.format(chave=chave, data=data)
+
+
+def build_pdf(paginas):
+    """
+    Gera em memória um PDF com uma página por texto informado e retorna seus bytes.
+    """
+    import pymupdf
+
+    from processor.source import mupdf_lock
+
+    with mupdf_lock, pymupdf.open() as doc:
+        for texto in paginas:
+            pagina = doc.new_page()
+            if texto:
+                pagina.insert_text((72, 72), texto, fontsize=10)
+        return doc.tobytes()
+
+
+def sample_pages(sistema_processual, eventos=2, paginas_por_evento=2):
+    """
+    Textos de um documento com `eventos` eventos, cada um com a página marcadora
+    seguida de páginas de conteúdo.
+    """
+    paginas = []
+    for chave in range(1, eventos + 1):
+        paginas.append(marker_page(sistema_processual, chave) or "")
+        paginas.extend(f"Conteúdo do evento {chave}" for _ in range(paginas_por_evento - 1))
+    return paginas
+
+
+def sample_pdf(sistema_processual, eventos=2, paginas_por_evento=2):
+    return build_pdf(sample_pages(sistema_processual, eventos, paginas_por_evento))
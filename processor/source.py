@@ -0,0 +1,158 @@
+"""
+Documento de origem compartilhado entre as etapas de uma requisição.
+
+O PDF enviado é gravado uma única vez no disco (uploads grandes, que o Django já
+guardou em arquivo, são apenas vinculados com hardlink) e o PyMuPDF o abre pelo
+caminho, lendo sob demanda pelo page cache do sistema operacional. Assim o arquivo
+não é copiado para a memória de cada etapa, e processos diferentes que abrem o
+mesmo arquivo compartilham as mesmas páginas em cache.
+
+Concorrência: o PyMuPDF não é thread-safe (o contexto do MuPDF é global ao
+processo), então cada thread usa seu próprio handle do documento e toda chamada
+ao MuPDF é feita sob `mupdf_lock`, em trechos curtos (uma página ou um evento),
+para que as requisições se intercalem. Em workers com threads (gthread/ASGI) as
+etapas de I/O (upload, gravação, compactação, resposta) rodam em paralelo e o
+trabalho no MuPDF é serializado por processo; `pipeline_slot` limita quantas
+requisições processam documentos (extração e divisão) ao mesmo tempo
+(PDF_MAX_CONCURRENT_PIPELINES). Respostas em streaming ocupam a vaga só enquanto
+extraem o próximo evento: entre um evento e outro, enquanto o cliente lê, o
+documento fica aberto fora da vaga. Quantas respostas desse tipo ficam abertas ao
+mesmo tempo é limitado pelas threads do worker.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Serializa as chamadas ao MuPDF no processo
+mupdf_lock = threading.RLock()
+
+_pipeline_slots = None
+_pipeline_slots_lock = threading.Lock()
+
+
+@contextmanager
+def pipeline_slot():
+    """
+    Reserva uma das PDF_MAX_CONCURRENT_PIPELINES vagas de processamento do processo.
+    """
+    global _pipeline_slots
+    if _pipeline_slots is None:
+        with _pipeline_slots_lock:
+            if _pipeline_slots is None:
+                _pipeline_slots = threading.BoundedSemaphore(settings.PDF_MAX_CONCURRENT_PIPELINES)
+
+    with _pipeline_slots:
+        yield
+
+
+class PdfSource:
+    """
+    PDF de origem aberto uma vez e reaproveitado pelo processador e pelo divisor.
+    Cada thread recebe seu próprio handle do documento. `guard` (ResourceGuard)
+    limita as etapas que usam o documento; sem ele, não há limites.
+    """
+    def __init__(self, path, guard=None):
+        self.path = path
+        self.guard = guard
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._sha256 = None
+
+    @classmethod
+    def from_upload(cls, uploaded_file, directory):
+        """
+        Grava o arquivo enviado em `directory` sem copiar quando ele já está em disco.
+        """
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.pdf")
+
+        if hasattr(uploaded_file, "temporary_file_path"):
+            try:
+                os.link(uploaded_file.temporary_file_path(), path)
+                return cls(path)
+            except OSError:
+                # Outro sistema de arquivos: cai para a cópia
+                pass
+
+        with open(path, "xb") as destino:
+            for chunk in uploaded_file.chunks():
+                destino.write(chunk)
+        return cls(path)
+
+    @property
+    def document(self):
+        thread_id = threading.get_ident()
+        document = self._documents.get(thread_id)
+        if document is None:
+            import pymupdf
+
+            with mupdf_lock:
+                document = pymupdf.open(self.path)
+            with self._lock:
+                self._documents[thread_id] = document
+        return document
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = file_sha256(self.path)
+        return self._sha256
+
+    def close(self):
+        with self._lock:
+            documents = list(self._documents.values())
+            self._documents.clear()
+
+        with mupdf_lock:
+            for document in documents:
+                document.close()
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as arquivo:
+        while chunk := arquivo.read(chunk_size):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def source_sha256(source):
+    return source.sha256 if isinstance(source, PdfSource) else file_sha256(source)
+
+
+def source_path(source):
+    return source.path if isinstance(source, PdfSource) else source
+
+
+@contextmanager
+def open_document(source):
+    """
+    Documento PyMuPDF de um PdfSource (compartilhado, não é fechado aqui) ou de um caminho.
+    """
+    if isinstance(source, PdfSource):
+        yield source.document
+        return
+
+    import pymupdf
+
+    with mupdf_lock:
+        doc = pymupdf.open(source)
+    try:
+        yield doc
+    finally:
+        with mupdf_lock:
+            doc.close()
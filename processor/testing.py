@@ -0,0 +1,14 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+
+class TempDirTestCase(SimpleTestCase):
+    """
+    Testes que gravam PDFs: cada teste recebe um diretório temporário (self.temp_dir), removido ao final.
+    """
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
@@ -1,3 +1,319 @@
-from django.test import TestCase
+import dataclasses
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from app import profiling
+from processor.golden import GOLDEN_CORPUS, evento, write_golden_pdf
+from processor.guard import LIMITE_PAGINAS, LIMITE_TEMPO, ResourceGuard, trip_counts
+from processor import processors as processors_module
+from processor.processors import ProcessorBase, SpecProcessor
+from processor.registry import NOT_IMPLEMENTED, SPECS, ProcessorRegistry, registry
+from processor.samples import sample_pdf
+from processor.source import PdfSource, mupdf_lock
+from processor import source as source_module
+from processor.testing import TempDirTestCase
+from processor.views import ProcessarPDFView
+
+# Vazão mínima do processamento (extração de texto + detecção + datas). Fica bem abaixo
+# da medida atual para não falhar por ruído de máquina, mas acusa regressões grosseiras.
+MIN_PAGINAS_POR_SEGUNDO = 500
+THROUGHPUT_EVENTOS = 100
+THROUGHPUT_PAGINAS_POR_EVENTO = 5
+
+
+class GoldenCorpusTests(TempDirTestCase):
+    """
+    Eventos extraídos de cada sistema comparados com o corpus de referência.
+    """
+    def test_corpus_covers_all_systems(self):
+        self.assertEqual(sorted(GOLDEN_CORPUS), sorted(registry.names()))
+
+    def test_process(self):
+        for sistema in GOLDEN_CORPUS:
+            with self.subTest(sistema=sistema):
+                pdf_path, esperado = write_golden_pdf(sistema, self.temp_dir)
+                self.assertEqual(registry.get(sistema).process(pdf_path), esperado)
+
+    def test_process_shared_source(self):
+        for sistema in GOLDEN_CORPUS:
+            with self.subTest(sistema=sistema):
+                pdf_path, esperado = write_golden_pdf(sistema, self.temp_dir)
+                with PdfSource(pdf_path) as source:
+                    self.assertEqual(registry.get(sistema).process(source), esperado)
+
+    def test_stream(self):
+        for sistema in GOLDEN_CORPUS:
+            with self.subTest(sistema=sistema):
+                pdf_path, esperado = write_golden_pdf(sistema, self.temp_dir)
+                self.assertEqual(list(registry.get(sistema).stream(pdf_path)), esperado)
+
+    def test_numbering(self):
+        # process numera com zeros à esquerda; stream, sem saber o total, não
+        pdf_path = os.path.join(self.temp_dir, "numeracao.pdf")
+        with open(pdf_path, "wb") as arquivo:
+            arquivo.write(sample_pdf("PJE", eventos=12))
+
+        processor = registry.get("PJE")
+        self.assertEqual(
+            [evento["numero_evento"] for evento in processor.process(pdf_path)],
+            [f"{numero:02d}" for numero in range(1, 13)],
+        )
+        self.assertEqual(
+            [evento["numero_evento"] for evento in processor.stream(pdf_path)],
+            [str(numero) for numero in range(1, 13)],
+        )
+
+
+# Plugins usados por RegistryTests, carregados pelo caminho em PROCESSOR_PLUGINS
+PLUGIN_SPEC = dataclasses.replace(SPECS[0], name="PJE-Plugin")
+
+
+class PaginaPorEventoProcessor(ProcessorBase):
+    date_pattern = re.compile(r"(\d{2}/\d{2}/\d{4})")
+
+    def detect_events(self, texto_paginas):
+        return [
+            {"pagina_inicial": pagina, "pagina_final": pagina, "pagina_marcador": pagina}
+            for pagina in texto_paginas
+        ]
+
+
+@override_settings(PROCESSOR_PLUGINS={
+    "PJE-Plugin": "processor.tests.PLUGIN_SPEC",
+    "Por página": "processor.tests.PaginaPorEventoProcessor",
+})
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = ProcessorRegistry()
+
+    def test_names_include_plugins(self):
+        nomes = self.registry.names()
+        self.assertEqual(nomes[:len(SPECS)], [spec.name for spec in SPECS])
+        self.assertIn("PJE-Plugin", nomes)
+        self.assertIn("Por página", nomes)
+        for nome in NOT_IMPLEMENTED:
+            self.assertNotIn(nome, nomes)
+
+    def test_spec_plugin(self):
+        processor = self.registry.get("PJE-Plugin")
+        self.assertIsInstance(processor, SpecProcessor)
+        self.assertIs(processor.spec, PLUGIN_SPEC)
+        # Compilado uma vez e reaproveitado
+        self.assertIs(self.registry.get("PJE-Plugin"), processor)
+
+    def test_processor_plugin(self):
+        processor = self.registry.get("Por página")
+        self.assertIsInstance(processor, PaginaPorEventoProcessor)
+        self.assertIs(self.registry.get("Por página"), processor)
+
+    def test_unknown_system(self):
+        with self.assertRaisesRegex(ValueError, "Sistema desconhecido"):
+            self.registry.get("Inexistente")
+
+    def test_not_implemented(self):
+        for nome in NOT_IMPLEMENTED:
+            with self.subTest(nome=nome), self.assertRaises(NotImplementedError):
+                self.registry.get(nome)
+
+    def test_register_is_not_replaced_by_plugins(self):
+        spec = dataclasses.replace(PLUGIN_SPEC, date=r"(\d{4})")
+        self.registry.register("PJE-Plugin", spec)
+        self.assertIs(self.registry.get("PJE-Plugin").spec, spec)
+
+
+class PluginProcessTests(TempDirTestCase):
+    def test_plugins_process_pdf(self):
+        pdf_path, esperado = write_golden_pdf("PJE", self.temp_dir)
+        plugins = {
+            "PJE-Plugin": "processor.tests.PLUGIN_SPEC",
+            "Por página": "processor.tests.PaginaPorEventoProcessor",
+        }
+        with override_settings(PROCESSOR_PLUGINS=plugins):
+            registro = ProcessorRegistry()
+            self.assertEqual(registro.get("PJE-Plugin").process(pdf_path), esperado)
+
+            eventos = registro.get("Por página").process(pdf_path)
+        self.assertEqual(len(eventos), len(GOLDEN_CORPUS["PJE"][0]))
+        self.assertEqual([evento["pagina_inicial"] for evento in eventos], list(range(1, len(eventos) + 1)))
+
+
+def lock_held_elsewhere():
+    """
+    Se o mupdf_lock está com outra thread (a que chamou esta função).
+    """
+    livre = []
+
+    def tentar():
+        livre.append(mupdf_lock.acquire(blocking=False))
+        if livre[0]:
+            mupdf_lock.release()
+
+    verificacao = threading.Thread(target=tentar)
+    verificacao.start()
+    verificacao.join()
+    return not livre[0]
+
+
+class MupdfLockTests(SimpleTestCase):
+    def test_page_count_read_under_lock(self):
+        chamadas = []
+
+        class Documento:
+            def __len__(self):
+                chamadas.append(("len", lock_held_elsewhere()))
+                return 2
+
+            def load_page(self, pagina_num):
+                chamadas.append(("load_page", lock_held_elsewhere()))
+                return mock.Mock(get_text=mock.Mock(return_value=f"página {pagina_num}"))
+
+        @contextmanager
+        def open_document(source):
+            yield Documento()
+
+        with mock.patch.object(processors_module, "open_document", open_document):
+            paginas = list(registry.get("PJE").iter_pages("documento.pdf"))
+
+        self.assertEqual(paginas, [(1, "página 0"), (2, "página 1")])
+        self.assertEqual(chamadas, [("len", True), ("load_page", True), ("load_page", True)])
+
+
+class ResourceGuardTests(TempDirTestCase):
+    """
+    Ao atingir um limite, o processamento para na página atual e devolve o resultado parcial.
+    """
+    def test_page_limit(self):
+        pdf_path, _ = write_golden_pdf("PJE", self.temp_dir)
+        disparos = trip_counts().get(LIMITE_PAGINAS, 0)
+
+        with PdfSource(pdf_path, guard=ResourceGuard(max_paginas=5)) as source:
+            eventos = registry.get("PJE").process(source)
+
+        self.assertEqual(eventos, [evento("1", 2, 4, "02-03-2023"), evento("2", 5, 5, "15-04-2023")])
+        self.assertEqual(source.guard.status, "parcial")
+        self.assertEqual(source.guard.headers(), {"X-Guard-Status": "parcial", "X-Guard-Limit": LIMITE_PAGINAS})
+        self.assertEqual(trip_counts()[LIMITE_PAGINAS], disparos + 1)
+
+    def test_time_limit_stops_stream(self):
+        pdf_path, _ = write_golden_pdf("TJSE", self.temp_dir)
+        guard = ResourceGuard(max_segundos=1)
+        # Simula o início do processamento há mais de um segundo
+        guard._inicio = time.monotonic() - 2
+
+        with PdfSource(pdf_path, guard=guard) as source:
+            self.assertEqual(list(registry.get("TJSE").stream(source)), [])
+        self.assertEqual(guard.limite, LIMITE_TEMPO)
+
+    def test_without_limits(self):
+        pdf_path, esperado = write_golden_pdf("ESAJ", self.temp_dir)
+        with PdfSource(pdf_path, guard=ResourceGuard()) as source:
+            self.assertEqual(registry.get("ESAJ").process(source), esperado)
+        self.assertEqual(source.guard.headers(), {"X-Guard-Status": "concluido"})
+
+
+class StreamingViewTests(TempDirTestCase):
+    def post_stream(self, user=None, **extra):
+        pdf_path, _ = write_golden_pdf("PJE", self.temp_dir)
+        with open(pdf_path, "rb") as arquivo:
+            request = APIRequestFactory().post(
+                "/api/v1/pdf-processor/?stream=1", {"file": arquivo, "sistema_processual": "PJE"}, **extra
+            )
+        force_authenticate(request, user or get_user_model()(username="teste"))
+        return ProcessarPDFView.as_view()(request)
+
+    def workspace_files(self):
+        return [arquivo for arquivo in os.listdir(self.temp_dir) if not arquivo.startswith("golden_")]
+
+    def test_slot_released_while_client_reads(self):
+        vagas = threading.BoundedSemaphore(1)
+        with override_settings(TEMP_DIR=self.temp_dir), mock.patch.object(source_module, "_pipeline_slots", vagas):
+            response = self.post_stream()
+            linhas = iter(response.streaming_content)
+            primeiro = json.loads(next(linhas))
+
+            # Com a resposta parada no primeiro evento, a única vaga está livre para outras requisições
+            self.assertTrue(vagas.acquire(blocking=False))
+            vagas.release()
+
+            resto = [json.loads(linha) for linha in linhas]
+            response.close()
+
+        self.assertEqual(primeiro["pagina_inicial"], 2)
+        self.assertEqual(resto[-1]["resumo"]["status"], "concluido")
+        self.assertEqual(self.workspace_files(), [])
+
+    def test_unread_response_releases_source(self):
+        with override_settings(TEMP_DIR=self.temp_dir):
+            response = self.post_stream()
+            self.assertEqual(len(self.workspace_files()), 1)
+
+            # Cliente desconectado antes de a resposta ser iterada
+            response.close()
+
+        self.assertEqual(self.workspace_files(), [])
+
+
+    def post_profiled_stream(self):
+        return self.post_stream(get_user_model()(username="staff", is_staff=True), HTTP_X_PROFILE="1")
+
+    def test_stream_is_profiled(self):
+        perfis = os.path.join(self.temp_dir, "perfis")
+        with override_settings(
+            TEMP_DIR=self.temp_dir, PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=perfis
+        ):
+            response = self.post_profiled_stream()
+            linhas = [json.loads(linha) for linha in response.streaming_content]
+            response.close()
+            capturas = profiling.get_store().list()
+            with open(profiling.get_store().path(capturas[0]["nome"] + ".txt"), encoding="utf-8") as arquivo:
+                resumo = arquivo.read()
+
+        self.assertEqual(linhas[-1]["resumo"]["status"], "concluido")
+        self.assertEqual(len(capturas), 1)
+        self.assertTrue(capturas[0]["nome"].endswith("_pdf-processor-stream"))
+        # Os trechos de cada evento se acumulam no mesmo perfil
+        self.assertIn("iter_events", resumo)
+        self.assertFalse(profiling._profile_lock.locked())
+
+    def test_unread_profiled_stream_releases_profiler(self):
+        with override_settings(
+            TEMP_DIR=self.temp_dir, PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0,
+            PROFILING_DIR=os.path.join(self.temp_dir, "perfis"),
+        ):
+            response = self.post_profiled_stream()
+            self.assertTrue(profiling._profile_lock.locked())
+            response.close()
+
+        self.assertFalse(profiling._profile_lock.locked())
+        self.assertEqual(self.workspace_files(), ["perfis"])
+
+
+class ThroughputTests(TempDirTestCase):
+    def test_pages_per_second(self):
+        total_paginas = THROUGHPUT_EVENTOS * THROUGHPUT_PAGINAS_POR_EVENTO
+
+        for sistema in registry.names():
+            with self.subTest(sistema=sistema):
+                pdf_path = os.path.join(self.temp_dir, f"vazao_{sistema}.pdf")
+                with open(pdf_path, "wb") as arquivo:
+                    arquivo.write(sample_pdf(sistema, THROUGHPUT_EVENTOS, THROUGHPUT_PAGINAS_POR_EVENTO))
+
+                processor = registry.get(sistema)
+                inicio = time.perf_counter()
+                eventos = processor.process(pdf_path)
+                paginas_por_segundo = total_paginas / (time.perf_counter() - inicio)
+
+                self.assertEqual(len(eventos), THROUGHPUT_EVENTOS)
+                self.assertGreaterEqual(
+                    paginas_por_segundo, MIN_PAGINAS_POR_SEGUNDO,
+                    f"{sistema}: {paginas_por_segundo:.0f} páginas/s",
+                )
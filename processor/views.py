@@ -1,427 +1,84 @@
-import os
-import re
-import tempfile
+import json
+import logging
+import time
 
-import pymupdf
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from django.conf import settings
+from app.middlewares import get_workspace
+from app.profiling import RequestProfile, profile_request
+from processor.factory import ProcessorFactory
+from processor.guard import ResourceGuard
+from processor.source import mupdf_lock, pipeline_slot
+from uploads.store import request_source
 
-class ProcessorBase:
-    def process(self, pdf_path):
-        raise NotImplementedError("Subclasses devem implementar o método 'process'.")
-    
-    def extract_date(self, texto):
-        raise NotImplementedError("Subclasses devem implementar o método 'extract_date'.")
-    
-    def pdf_text_extract(self, pdf_path):
-        doc = pymupdf.open(pdf_path)
-        texto_paginas = {}
-        
-        for pagina_num in range(len(doc)):
-            pagina = doc.load_page(pagina_num)
-            texto_paginas[pagina_num + 1] = pagina.get_text()
-        
-        return texto_paginas
-    
-    def rename_events(self, events):
-        numero_evento = 0
-        total_eventos = len(events)
-        num_digitos = len(str(total_eventos))
+logger = logging.getLogger(__name__)
 
-        for event in events:
-            numero_evento += 1
-            event["numero_evento"] = f"{numero_evento:0{num_digitos}d}"  
-       
-        return events
+NDJSON = "application/x-ndjson"
 
-class PJEProcessor(ProcessorBase):
-    def process(self, pdf_path):
-        texto_paginas = self.pdf_text_extract(pdf_path)
-        eventos = self.pje_processor(texto_paginas)
-        return self.rename_events(eventos)
 
-    def extract_date(self, texto):
-        """
-        Extrai a data no formato DD-MM-YYYY de um texto.
-        """
-        match = re.search(r"\s+-\s+((?:0[1-9]|[12][0-9]|3[01])[-/](?:0[1-9]|1[0-2])[-/](?:\d{4}))", texto)
-        if match:
-            # Substitui / por -
-            return match.group(1).replace("/", "-")
-        return None
-
-    def pje_processor(self, texto_paginas):
-        eventos = []
-        evento_atual = None
-        total_paginas = len(texto_paginas)
-
-        for pagina_num, texto in texto_paginas.items():
-            match = re.search(r"Número do documento:\s*(\d+)", texto)
-            if match:
-                numero_evento = match.group(1)
-
-                # Extrai a data da página atual
-                data_evento = self.extract_date(texto)
-
-                if evento_atual and evento_atual["numero_evento"] != numero_evento:
-                    evento_atual["pagina_final"] = pagina_num - 1
-                    eventos.append(evento_atual)
-                    evento_atual = None
-
-                if not evento_atual:
-                    evento_atual = {
-                        "numero_evento": numero_evento,
-                        "pagina_inicial": pagina_num,
-                        "pagina_final": None,
-                        "data_evento": data_evento,
-                    }
-
-            elif evento_atual:
-                evento_atual["pagina_final"] = pagina_num
-
-                # Verifica se a data está na primeira página do evento
-                if evento_atual["pagina_inicial"] == pagina_num:
-                    data_na_pagina = self.extract_date(texto)
-
-        if evento_atual:
-            evento_atual["pagina_final"] = total_paginas
-            eventos.append(evento_atual)
-
-        return eventos
-
-
-class EPROCProcessor(ProcessorBase):
-    def process(self, pdf_path):
-        texto_paginas = self.pdf_text_extract(pdf_path)
-        eventos = self.eproc_processor(texto_paginas)
-        return self.rename_events(eventos)
-    
-    def extract_date(self, texto):
-        """
-        Extrai a data no formato DD-MM-YYYY de um texto.
-        """
-        match = re.search(r"(\d{2}/\d{2}/\d{4})", texto)
-        if match:
-            return match.group(1).replace("/", "-")
-
-        return None
-
-
-    def eproc_processor(self, texto_paginas):
-        eventos = []
-        evento_atual = None
-
-        for pagina_num, texto in texto_paginas.items():
-            # Identifica a página de separação
-            if "PÁGINA DE SEPARAÇÃO" in texto:
-                # Fecha o evento anterior, se existir
-                if evento_atual:
-                    evento_atual["pagina_inicial"] += 1
-                    evento_atual["pagina_final"] = pagina_num - 1
-
-                    # Verifica se o evento é válido antes de adicioná-lo
-                    if evento_atual["pagina_final"] is not None and evento_atual["pagina_inicial"] <= evento_atual["pagina_final"]:
-                        eventos.append(evento_atual)
-
-                # Extrai o número do evento
-                numero_evento_match = re.search(r"Evento (\d+)", texto)
-                numero_evento = int(numero_evento_match.group(1)) if numero_evento_match else None
-
-                # Extrai a data na página de separação
-                data_evento = self.extract_date(texto)
-
-                # Inicia um novo evento
-                evento_atual = {
-                    "numero_evento": numero_evento,
-                    "pagina_inicial": pagina_num,
-                    "pagina_final": None,
-                    "data_evento": data_evento,
-                }
-                
-            else:
-                # Continua atualizando a página final do evento atual
-                if evento_atual:
-                    evento_atual["pagina_final"] = pagina_num
-
-                    # Verifica se a data está na primeira página do evento
-                    if evento_atual["pagina_inicial"] == pagina_num:
-                        data_na_pagina = self.extract_date(texto)
-
-        # Adiciona o último evento, se ainda não foi adicionado
-        if evento_atual:
-            evento_atual["pagina_inicial"] += 1
-            if evento_atual["pagina_final"] is not None and evento_atual["pagina_inicial"] <= evento_atual["pagina_final"]:
-                eventos.append(evento_atual)
-
-        # Verificação adicional: remove eventos sem número de evento
-        eventos = [evento for evento in eventos if evento["numero_evento"] is not None]
-
-        return eventos
-
-
-class ESAJProcessor(ProcessorBase):
-    def process(self, pdf_path):
-        texto_paginas = self.pdf_text_extract(pdf_path)
-        eventos = self.esaj_processor(texto_paginas)
-        return self.rename_events(eventos)
-
-    def extract_date(self, texto):
-        """
-        Extrai a data no formato DD-MM-YYYY de um texto.
-        """
-        match = re.search(r'(?:protocolado em|liberado nos autos em) (\d{2}/\d{2}/\d{4})', texto)
-        if match:
-            # Substitui / por -
-            return match.group(1).replace("/", "-")
-        return None
-
-    def esaj_processor(self, texto_paginas):
-        codigos = []
-        eventos = []
-        evento_atual = None
-
-        for pagina_num, texto in texto_paginas.items():
-            # Busca pelo código na página
-            match = re.search(r'código\s([a-zA-Z0-9]{8}\.)', texto)
-            if match:
-                codigo = match.group(1)
-
-                # Extrai a data do texto
-                data_evento = self.extract_date(texto)
-
-                # Se o código é novo, finalize o evento anterior
-                if evento_atual and evento_atual["codigo"] != codigo:
-                    eventos.append(evento_atual)
-                    evento_atual = None
-
-                # Inicia um novo evento se necessário
-                if not evento_atual:
-                    evento_atual = {
-                        "numero_evento": len(codigos) + 1 if codigo not in codigos else codigos.index(codigo) + 1,
-                        "codigo": codigo,
-                        "pagina_inicial": pagina_num,
-                        "pagina_final": pagina_num,  # Atualizado mais tarde
-                        "data_evento": data_evento,
-                    }
-
-                # Atualiza a página final do evento atual
-                evento_atual["pagina_final"] = pagina_num
-
-                # Verifica se a data está na primeira página
-                if evento_atual["pagina_inicial"] == pagina_num:
-                    data_na_pagina = self.extract_date(texto)
-
-                # Adiciona o código à lista de códigos, se ainda não existir
-                if codigo not in codigos:
-                    codigos.append(codigo)
-            elif evento_atual:
-                # Atualiza a página final enquanto o evento está ativo
-                evento_atual["pagina_final"] = pagina_num
-
-        # Finaliza o último evento, se existir
-        if evento_atual:
-            eventos.append(evento_atual)
-
-        # Remove o campo 'codigo' do resultado final
-        for evento in eventos:
-            evento.pop("codigo", None)
+class EventStream:
+    """
+    Conteúdo da resposta em streaming. O Django fecha o conteúdo ao fim da resposta,
+    mesmo que ele nunca tenha sido iterado (cliente desconectado antes), e `close`
+    libera o PDF nesse caso; o gerador não iniciado não executaria seu `finally`.
+    """
+    def __init__(self, linhas, liberar):
+        self.linhas = linhas
+        self.liberar = liberar
 
-        return eventos
+    def __iter__(self):
+        return self.linhas
 
-class PROJUDIProcessor(ProcessorBase): 
-    def process(self, pdf_path):
-        texto_paginas = self.pdf_text_extract(pdf_path)
-        eventos = self.projudi_processor(texto_paginas)
-        return self.rename_events(eventos)
-    
-    def extract_date(self, texto):
-        # OBS: PROJUDI BA não tem data de publicação do evento no PDF
-        regex = (
-            r"Publicado Digitalmente em (\d{2}/\d{2}/\d{4})|" # PROJUDI GO
-            r"(\d{2}/\d{2}/\d{4}):" # PROJUDI AM e PR
-        )
+    def close(self):
+        self.linhas.close()
+        self.liberar()
 
-        match = re.search(regex, texto) 
-
-        if match:
-            data_evento = match.group(1) if match.group(1) else match.group(2)
-            return data_evento.replace("/", "-")
-        
-        return None
-    
-    def projudi_processor(self, texto_paginas):
-        codigos = []
-        eventos = []
-        evento_atual = None
-
-        for pagina_num, texto in texto_paginas.items():
-            # Busca pelo código na página
-            # Regex para PROJUDI AM, BA, GO, PR (talvez seja necessário implementar para outros estados
-            regex = (
-                r"documento:\s([a-zA-Z0-9]{8}\s)|"
-                r"código:\s([0-9]{27}\,)|"
-                r"- Identificador:\s([A-Z0-9]{5}\s[A-Z0-9]{5}\s[A-Z0-9]{5}\s[A-Z0-9]{5})"
-            )
-
-            match = re.search(regex, texto)
-
-            if match:
-                codigo = match.group(1) or match.group(2) or match.group(3)
-
-                data_evento = self.extract_date(texto)
-
-                # Se o código é novo, finalize o evento anterior
-                if evento_atual and evento_atual["codigo"] != codigo:
-                    eventos.append(evento_atual)
-                    evento_atual = None
-
-                # Inicia um novo evento se necessário
-                if not evento_atual:
-                    evento_atual = {
-                        "numero_evento": len(codigos) + 1 if codigo not in codigos else codigos.index(codigo) + 1,
-                        "codigo": codigo,
-                        "pagina_inicial": pagina_num,
-                        "pagina_final": pagina_num,
-                        "data_evento": data_evento,
-                    }
-
-                # Atualiza a página final do evento atual
-                evento_atual["pagina_final"] = pagina_num
-
-                # Adiciona o código à lista de códigos, se ainda não existir
-                if codigo not in codigos:
-                    codigos.append(codigo)
-            elif evento_atual:
-                # Atualiza a página final enquanto o evento está ativo
-                evento_atual["pagina_final"] = pagina_num
-
-        # Finaliza o último evento, se existir
-        if evento_atual:
-            eventos.append(evento_atual)
-
-        # Remove o campo 'codigo' do resultado final
-        for evento in eventos:
-            evento.pop("codigo", None)
-
-        return eventos
-
-class TJSEProcessor(ProcessorBase):
-    def process(self, pdf_path):
-        texto_paginas = self.pdf_text_extract(pdf_path)
-        eventos = self.tjse_processor(texto_paginas)
-        return self.rename_events(eventos)
-
-    def extract_date(self, texto):
-        regex = r'DATA:\s+(\d{2}/\d{2}/\d{4})'
-        match = re.search(regex, texto)
-        if match:
-            data_evento = match.group(1).replace("/", "-")
-            return data_evento
-            
-    def tjse_processor(self, texto_paginas):
-        codigos = []
-        eventos = []
-        evento_atual = None
-
-        for pagina_num, texto in texto_paginas.items():
-            # Busca pelo código na página
-            # Regex para PROJUDI AM, BA, GO, PR (talvez seja necessário implementar para outros estados
-            match = re.search(r'MOVIMENTO:\s+(.+)', texto)
-            if match:
-                codigo = match.group(1)
-
-
-                # Se o código é novo, finalize o evento anterior
-                if evento_atual and evento_atual["codigo"] != codigo:
-                    eventos.append(evento_atual)
-                    evento_atual = None
-
-                # Inicia um novo evento se necessário
-                if not evento_atual:
-                    evento_atual = {
-                        "numero_evento": len(codigos) + 1 if codigo not in codigos else codigos.index(codigo) + 1,
-                        "codigo": codigo,
-                        "pagina_inicial": pagina_num,
-                        "pagina_final": pagina_num,
-                        "data_evento": self.extract_date(texto),
-                    }
-
-                # Atualiza a página final do evento atual
-                evento_atual["pagina_final"] = pagina_num
-
-                # Adiciona o código à lista de códigos, se ainda não existir
-                if codigo not in codigos:
-                    codigos.append(codigo)
-            elif evento_atual:
-                # Atualiza a página final enquanto o evento está ativo
-                evento_atual["pagina_final"] = pagina_num
-
-        # Finaliza o último evento, se existir
-        if evento_atual:
-            eventos.append(evento_atual)
-
-        # Remove o campo 'codigo' do resultado final
-        for evento in eventos:
-            evento.pop("codigo", None)
-
-        return eventos        
-
-class ProcessorFactory:
-    def get_processor(self, sistema_processual):
-
-        def not_implemented():
-            if sistema_processual not in systems:
-                raise ValueError("Sistema desconhecido.")
-            
-            raise NotImplementedError(f"Sistema {sistema_processual} não implementado.")
-
-        systems = {
-            "PJE": PJEProcessor,
-            "E-proc": EPROCProcessor,
-            "ESAJ": ESAJProcessor,
-            "PROJUDI": PROJUDIProcessor,
-            "TJSE": TJSEProcessor,
-            
-            "Creta": not_implemented,
-            "Gov.br": not_implemented,
-            "Siscad": not_implemented,
-            "Tucujuris": not_implemented,
-        }
-
-        processor = systems.get(sistema_processual, not_implemented)
-        
-        return processor()
 
 class ProcessarPDFView(APIView):
     parser_classes = [MultiPartParser]
     permission_classes = (IsAuthenticated,)
 
     def post(self, request):
-        pdf_file = request.FILES.get('file')
-        if not pdf_file:
+        # O PDF vem no campo 'file' ou já enviado em partes, indicado por 'upload_id'
+        if not request.FILES.get('file') and not request.data.get('upload_id'):
             return Response({"error": "Nenhum arquivo enviado."}, status=status.HTTP_400_BAD_REQUEST)
 
         sistema_processual = request.data.get('sistema_processual')
         if not sistema_processual:
             return Response({"error": "Sistema processual não especificado."}, status=status.HTTP_400_BAD_REQUEST)
 
+        source = None
+        temporario = False
         try:
-            # Salva o PDF temporariamente no diretório TEMP_DIR
-            with tempfile.NamedTemporaryFile(suffix=".pdf", dir=settings.TEMP_DIR, delete=False) as temp_pdf:
-                for chunk in pdf_file.chunks():
-                    temp_pdf.write(chunk)
-
-                temp_pdf_path = temp_pdf.name
+            # Salva o PDF temporariamente no diretório da requisição (uploads em partes são usados no lugar)
+            source, _, temporario = request_source(request, get_workspace(request))
+            source.guard = ResourceGuard.from_settings()
 
             processor = ProcessorFactory().get_processor(sistema_processual)
-            resultado = processor.process(temp_pdf_path)
 
-            return Response(resultado, status=status.HTTP_200_OK)
+            if self.wants_stream(request):
+                # Abre o documento antes de iniciar a resposta: PDFs inválidos ainda recebem um erro HTTP
+                source.document
+                perfil = RequestProfile(request, "pdf-processor-stream")
+                liberar = self.release_stream(source, temporario, perfil)
+                response = StreamingHttpResponse(
+                    EventStream(self.stream_events(processor, source, liberar, perfil), liberar),
+                    content_type=NDJSON,
+                )
+                # A partir daqui a resposta é a responsável por liberar o arquivo
+                source = None
+                return response
+
+            with pipeline_slot(), profile_request(request, "pdf-processor"):
+                resultado = processor.process(source)
+
+            # Resultado parcial (limite atingido) é indicado nos cabeçalhos X-Guard-*
+            return Response(resultado, status=status.HTTP_200_OK, headers=source.guard.headers())
 
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -431,5 +88,74 @@ class ProcessarPDFView(APIView):
 
         finally:
             # Remove o arquivo temporário após o processamento
-            if os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
+            if source and temporario:
+                source.remove()
+            elif source:
+                source.close()
+
+    def wants_stream(self, request):
+        """
+        Modo streaming: '?stream=1', campo 'stream' no formulário ou 'Accept: application/x-ndjson'.
+        """
+        flag = request.query_params.get("stream") or request.data.get("stream")
+        return str(flag).lower() in ("1", "true") or NDJSON in request.headers.get("Accept", "")
+
+    def release_stream(self, source, temporario, perfil):
+        """
+        Libera o PDF e salva o perfil (se houver) ao fim da resposta em streaming.
+        """
+        def liberar():
+            perfil.finish()
+            if temporario:
+                source.remove()
+            else:
+                source.close()
+        return liberar
+
+    def stream_events(self, processor, source, liberar, perfil):
+        """
+        Gera uma linha JSON por evento, assim que a máquina de estados o fecha, e
+        termina com um registro {"resumo": {...}} com páginas, total e tempos.
+
+        A vaga de processamento (pipeline_slot) é ocupada só enquanto o próximo evento
+        é extraído, e não enquanto a linha espera um cliente lento consumir a resposta:
+        o documento continua aberto nesse intervalo, fora da vaga. O perfil, quando
+        pedido, também cobre só a extração de cada evento.
+        """
+        inicio = time.perf_counter()
+        primeiro_evento = None
+        total_eventos = 0
+
+        try:
+            eventos = processor.stream(source)
+            while True:
+                with pipeline_slot(), perfil.section():
+                    evento = next(eventos, None)
+                if evento is None:
+                    break
+
+                if primeiro_evento is None:
+                    primeiro_evento = time.perf_counter() - inicio
+                total_eventos += 1
+                yield json.dumps(evento, ensure_ascii=False) + "\n"
+
+            with mupdf_lock:
+                total_paginas = source.document.page_count
+
+            resumo = {"status": source.guard.status, "total_paginas": total_paginas}
+            if source.guard.limite:
+                resumo["limite"] = source.guard.limite
+        except Exception as e:
+            logger.error(f"Erro no processamento em streaming: {e}")
+            resumo = {"status": "erro", "error": str(e)}
+        finally:
+            liberar()
+
+        resumo.update({
+            "total_eventos": total_eventos,
+            # Largura para numerar os eventos com zeros à esquerda, como na resposta completa
+            "digitos_numero_evento": len(str(total_eventos)),
+            "tempo_primeiro_evento_ms": round(primeiro_evento * 1000, 1) if primeiro_evento is not None else None,
+            "tempo_total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        })
+        yield json.dumps({"resumo": resumo}, ensure_ascii=False) + "\n"
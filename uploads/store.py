@@ -0,0 +1,252 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+from processor.source import PdfSource, file_sha256
+
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadNotFound(UploadError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"Offset inválido; o upload está em {offset} bytes.")
+        self.offset = offset
+
+
+class ChecksumMismatch(UploadError):
+    pass
+
+
+class QuotaExceeded(UploadError):
+    pass
+
+
+class UploadStore:
+    """
+    Uploads em partes e retomáveis, gravados em disco fora do TEMP_DIR.
+
+    Cada upload tem um arquivo de dados (<id>.part, renomeado para <id>.pdf na
+    confirmação) e um arquivo de metadados (<id>.json). O tamanho do arquivo de
+    dados é o offset atual: cada parte deve começar exatamente nele.
+
+    Cada upload tem no máximo `max_bytes` e cada usuário, no máximo `max_por_usuario`
+    uploads em andamento (ainda não confirmados), o que limita o espaço em disco que um
+    cliente ocupa. Uploads confirmados não contam na cota; ficam disponíveis para
+    processamento até expirar ou serem removidos com `delete`.
+    """
+    def __init__(self, directory, ttl, max_chunk_bytes, max_bytes, max_por_usuario):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_bytes = max_bytes
+        self.max_por_usuario = max_por_usuario
+
+    def _path(self, upload_id, extensao):
+        if not UPLOAD_ID.match(upload_id or ""):
+            raise UploadNotFound("Upload não encontrado.")
+        return os.path.join(self.directory, f"{upload_id}{extensao}")
+
+    def _save_meta(self, meta):
+        caminho = self._path(meta["upload_id"], ".json")
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, caminho)
+
+    def create(self, usuario, tamanho=None, nome_arquivo=None):
+        if tamanho is not None and tamanho <= 0:
+            raise UploadError("Tamanho inválido.")
+        if tamanho is not None and tamanho > self.max_bytes:
+            raise QuotaExceeded(f"Upload maior que o permitido ({self.max_bytes} bytes).")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.cleanup_expired()
+
+        if self.count_active(usuario) >= self.max_por_usuario:
+            raise QuotaExceeded(f"Limite de {self.max_por_usuario} uploads ativos por usuário atingido.")
+
+        meta = {
+            "upload_id": uuid.uuid4().hex,
+            "usuario": usuario,
+            "tamanho": tamanho,
+            "nome_arquivo": nome_arquivo,
+            "criado_em": time.time(),
+            "concluido": False,
+        }
+        open(self._path(meta["upload_id"], ".part"), "xb").close()
+        self._save_meta(meta)
+        return self.status(meta)
+
+    def get(self, upload_id, usuario):
+        try:
+            with open(self._path(upload_id, ".json"), encoding="utf-8") as arquivo:
+                meta = json.load(arquivo)
+        except FileNotFoundError:
+            raise UploadNotFound("Upload não encontrado.")
+
+        if meta["usuario"] != usuario:
+            raise UploadNotFound("Upload não encontrado.")
+        return meta
+
+    def count_active(self, usuario):
+        ativos = 0
+        for arquivo in os.listdir(self.directory):
+            if not arquivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, arquivo), encoding="utf-8") as dados:
+                    meta = json.load(dados)
+                ativos += meta["usuario"] == usuario and not meta["concluido"]
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+        return ativos
+
+    def delete(self, upload_id, usuario):
+        """
+        Remove o upload, em andamento ou confirmado, liberando o espaço em disco.
+        """
+        meta = self.get(upload_id, usuario)
+        self._remove(meta["upload_id"])
+
+    def _remove(self, upload_id):
+        # Metadados por último: sem eles, os arquivos de dados não são mais encontrados
+        for extensao in (".part", ".pdf", ".json"):
+            caminho = self._path(upload_id, extensao)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    def data_path(self, meta):
+        return self._path(meta["upload_id"], ".pdf" if meta["concluido"] else ".part")
+
+    def status(self, meta):
+        return {
+            "upload_id": meta["upload_id"],
+            "offset": os.path.getsize(self.data_path(meta)),
+            "tamanho": meta["tamanho"],
+            "concluido": meta["concluido"],
+        }
+
+    def write_chunk(self, upload_id, usuario, offset, stream, checksum=None):
+        """
+        Grava uma parte a partir de `offset`, lendo `stream` em blocos. Se o checksum
+        (sha256 hexadecimal) não conferir, a parte é descartada. Retorna o novo offset.
+        """
+        meta = self.get(upload_id, usuario)
+        if meta["concluido"]:
+            raise UploadError("Upload já concluído.")
+        limite_total = meta["tamanho"] or self.max_bytes
+
+        with open(self.data_path(meta), "r+b") as arquivo:
+            # Bloqueio entre processos: uma parte por vez em cada upload
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            atual = arquivo.seek(0, os.SEEK_END)
+            if offset != atual:
+                raise OffsetMismatch(atual)
+
+            sha256 = hashlib.sha256()
+            gravados = 0
+            while chunk := stream.read(64 * 1024):
+                gravados += len(chunk)
+                if gravados > self.max_chunk_bytes:
+                    arquivo.truncate(atual)
+                    raise UploadError("Parte maior que o permitido.")
+                if atual + gravados > limite_total:
+                    arquivo.truncate(atual)
+                    raise QuotaExceeded("Upload maior que o tamanho declarado ou permitido.")
+                sha256.update(chunk)
+                arquivo.write(chunk)
+
+            if checksum and sha256.hexdigest() != checksum.lower():
+                arquivo.truncate(atual)
+                raise ChecksumMismatch("Checksum da parte não confere.")
+
+        # O prazo de expiração conta a partir da última atividade
+        os.utime(self._path(upload_id, ".json"))
+        return atual + gravados
+
+    def commit(self, upload_id, usuario, sha256=None):
+        """
+        Confirma o upload: confere tamanho e checksum total e o deixa pronto para processamento.
+        """
+        meta = self.get(upload_id, usuario)
+        if meta["concluido"]:
+            return self.status(meta)
+
+        caminho = self.data_path(meta)
+        tamanho = os.path.getsize(caminho)
+        if meta["tamanho"] is not None and tamanho != meta["tamanho"]:
+            raise UploadError(f"Upload incompleto: {tamanho} de {meta['tamanho']} bytes.")
+        if sha256 and file_sha256(caminho) != sha256.lower():
+            raise ChecksumMismatch("Checksum do arquivo não confere.")
+
+        meta["concluido"] = True
+        meta["tamanho"] = tamanho
+        os.replace(caminho, self.data_path(meta))
+        self._save_meta(meta)
+        return self.status(meta)
+
+    def source(self, upload_id, usuario):
+        """
+        PdfSource apontando direto para o upload confirmado, sem cópia.
+        """
+        meta = self.get(upload_id, usuario)
+        if not meta["concluido"]:
+            raise UploadError("Upload ainda não concluído.")
+        return PdfSource(self.data_path(meta)), meta
+
+    def cleanup_expired(self):
+        limite = time.time() - self.ttl
+        for arquivo in os.listdir(self.directory):
+            if not arquivo.endswith(".json"):
+                continue
+            upload_id = arquivo[:-len(".json")]
+            try:
+                if os.path.getmtime(os.path.join(self.directory, arquivo)) >= limite:
+                    continue
+                self._remove(upload_id)
+            except (FileNotFoundError, UploadNotFound):
+                continue
+
+
+def get_upload_store():
+    return UploadStore(
+        settings.UPLOAD_DIR,
+        settings.UPLOAD_TTL,
+        settings.UPLOAD_MAX_CHUNK_BYTES,
+        settings.UPLOAD_MAX_BYTES,
+        settings.UPLOAD_MAX_PER_USER,
+    )
+
+
+def request_source(request, directory):
+    """
+    Documento de origem da requisição: o upload confirmado indicado em `upload_id`
+    ou o arquivo enviado em `file`. Retorna (source, nome_arquivo, temporario), onde
+    `temporario` indica se o arquivo pertence à requisição e deve ser removido no fim.
+    """
+    upload_id = request.data.get("upload_id")
+    if upload_id:
+        try:
+            source, meta = get_upload_store().source(upload_id, request.user.pk)
+        except UploadError as e:
+            raise ValueError(str(e))
+        return source, meta["nome_arquivo"] or upload_id, False
+
+    pdf_file = request.FILES.get("file")
+    if not pdf_file:
+        return None, None, False
+    return PdfSource.from_upload(pdf_file, directory), pdf_file.name, True
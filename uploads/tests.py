@@ -0,0 +1,133 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from processor.golden import GOLDEN_CORPUS
+from processor.samples import build_pdf
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        configuracao = override_settings(UPLOAD_DIR=self.upload_dir)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create(username="teste"))
+
+    def create(self, **dados):
+        response = self.client.post("/api/v1/uploads/", dados, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()["upload_id"]
+
+    def put(self, upload_id, conteudo, offset, **headers):
+        return self.client.generic(
+            "PUT", f"/api/v1/uploads/{upload_id}/", conteudo,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def offset(self, upload_id):
+        return self.client.get(f"/api/v1/uploads/{upload_id}/").json()["offset"]
+
+    def test_wrong_offset_returns_conflict(self):
+        upload_id = self.create()
+        self.assertEqual(self.put(upload_id, b"abc", 0).status_code, 200)
+
+        response = self.put(upload_id, b"def", 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 3)
+        self.assertEqual(self.offset(upload_id), 3)
+
+    def test_bad_checksum_truncates_chunk(self):
+        upload_id = self.create()
+        self.put(upload_id, b"abc", 0)
+
+        response = self.put(upload_id, b"def", 3, HTTP_UPLOAD_CHECKSUM=hashlib.sha256(b"outro").hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.offset(upload_id), 3)
+
+        # A parte é reenviada do mesmo ponto
+        response = self.put(upload_id, b"def", 3, HTTP_UPLOAD_CHECKSUM=hashlib.sha256(b"def").hexdigest())
+        self.assertEqual(response.json()["offset"], 6)
+
+    def test_empty_chunk_is_rejected(self):
+        upload_id = self.create()
+        response = self.put(upload_id, b"", 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Parte vazia."})
+
+    @override_settings(UPLOAD_MAX_BYTES=4)
+    def test_upload_size_quota(self):
+        self.assertEqual(self.client.post("/api/v1/uploads/", {"tamanho": 5}, format="json").status_code, 413)
+
+        upload_id = self.create()
+        self.assertEqual(self.put(upload_id, b"abc", 0).status_code, 200)
+        self.assertEqual(self.put(upload_id, b"de", 3).status_code, 413)
+        self.assertEqual(self.offset(upload_id), 3)
+
+    def test_invalid_size_is_rejected(self):
+        for tamanho in (-5, 0):
+            with self.subTest(tamanho=tamanho):
+                response = self.client.post("/api/v1/uploads/", {"tamanho": tamanho}, format="json")
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(UPLOAD_MAX_PER_USER=2)
+    def test_active_uploads_quota(self):
+        self.create()
+        self.create()
+        self.assertEqual(self.client.post("/api/v1/uploads/", {}, format="json").status_code, 413)
+
+    @override_settings(UPLOAD_MAX_PER_USER=1)
+    def test_committed_upload_releases_quota(self):
+        upload_id = self.create()
+        self.put(upload_id, b"abc", 0)
+        self.assertEqual(self.client.post(f"/api/v1/uploads/{upload_id}/commit/").status_code, 200)
+
+        self.create()
+
+    @override_settings(UPLOAD_MAX_PER_USER=1)
+    def test_delete_releases_quota(self):
+        upload_id = self.create()
+        self.put(upload_id, b"abc", 0)
+
+        self.assertEqual(self.client.delete(f"/api/v1/uploads/{upload_id}/").status_code, 204)
+        self.assertEqual(self.client.get(f"/api/v1/uploads/{upload_id}/").status_code, 404)
+        self.assertEqual(self.client.delete(f"/api/v1/uploads/{upload_id}/").status_code, 404)
+        self.create()
+
+    def test_delete_requires_owner(self):
+        upload_id = self.create()
+        outro = APIClient()
+        outro.force_authenticate(get_user_model().objects.create(username="outro"))
+
+        self.assertEqual(outro.delete(f"/api/v1/uploads/{upload_id}/").status_code, 404)
+        self.assertEqual(self.offset(upload_id), 0)
+
+    def test_process_committed_upload(self):
+        paginas, esperado = GOLDEN_CORPUS["PJE"]
+        pdf = build_pdf(paginas)
+        upload_id = self.create(tamanho=len(pdf), nome_arquivo="processo.pdf")
+
+        metade = len(pdf) // 2
+        self.put(upload_id, pdf[:metade], 0)
+        self.put(upload_id, pdf[metade:], metade)
+
+        # Sem commit, o upload ainda não pode ser processado
+        dados = {"upload_id": upload_id, "sistema_processual": "PJE"}
+        self.assertEqual(self.client.post("/api/v1/pdf-processor/", dados).status_code, 400)
+
+        response = self.client.post(
+            f"/api/v1/uploads/{upload_id}/commit/", {"sha256": hashlib.sha256(pdf).hexdigest()}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["concluido"])
+
+        response = self.client.post("/api/v1/pdf-processor/", dados)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), esperado)
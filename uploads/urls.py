@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import UploadCommitView, UploadCreateView, UploadDetailView
+
+urlpatterns = [
+    path("uploads/", UploadCreateView.as_view(), name="upload_create"),
+    path("uploads/<str:upload_id>/", UploadDetailView.as_view(), name="upload_detail"),
+    path("uploads/<str:upload_id>/commit/", UploadCommitView.as_view(), name="upload_commit"),
+]
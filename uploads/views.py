@@ -0,0 +1,96 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .store import (
+    ChecksumMismatch, OffsetMismatch, QuotaExceeded, UploadError, UploadNotFound, get_upload_store,
+)
+
+
+def error_response(e):
+    if isinstance(e, UploadNotFound):
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    if isinstance(e, OffsetMismatch):
+        return Response({"error": str(e), "offset": e.offset}, status=status.HTTP_409_CONFLICT)
+    if isinstance(e, QuotaExceeded):
+        return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UploadCreateView(APIView):
+    """
+    Inicia um upload em partes. Corpo opcional: {"tamanho": bytes, "nome_arquivo": "..."}.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        tamanho = request.data.get("tamanho")
+        try:
+            tamanho = int(tamanho) if tamanho is not None else None
+        except (TypeError, ValueError):
+            return Response({"error": "Tamanho inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultado = get_upload_store().create(request.user.pk, tamanho, request.data.get("nome_arquivo"))
+        except UploadError as e:
+            return error_response(e)
+        return Response(resultado, status=status.HTTP_201_CREATED)
+
+
+class UploadDetailView(APIView):
+    """
+    GET informa o offset atual, para retomar o envio.
+    PUT grava uma parte: corpo binário, header Upload-Offset com a posição inicial
+    e, opcionalmente, Upload-Checksum com o sha256 hexadecimal da parte.
+    DELETE remove o upload (por exemplo, depois de processado).
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, upload_id):
+        store = get_upload_store()
+        try:
+            return Response(store.status(store.get(upload_id, request.user.pk)))
+        except UploadError as e:
+            return error_response(e)
+
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return Response({"error": "Header Upload-Offset ausente ou inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Com Content-Length 0 o DRF não expõe o corpo (request.stream é None)
+        if request.stream is None:
+            return Response({"error": "Parte vazia."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            novo_offset = get_upload_store().write_chunk(
+                upload_id, request.user.pk, offset, request.stream, request.headers.get("Upload-Checksum")
+            )
+        except UploadError as e:
+            return error_response(e)
+        return Response({"upload_id": upload_id, "offset": novo_offset})
+
+    def delete(self, request, upload_id):
+        try:
+            get_upload_store().delete(upload_id, request.user.pk)
+        except UploadError as e:
+            return error_response(e)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadCommitView(APIView):
+    """
+    Conclui o upload. Corpo opcional: {"sha256": "..."} do arquivo completo.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, upload_id):
+        try:
+            resultado = get_upload_store().commit(upload_id, request.user.pk, request.data.get("sha256"))
+        except ChecksumMismatch as e:
+            return Response({"error": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except UploadError as e:
+            return error_response(e)
+        return Response(resultado)